@@ -1,9 +1,43 @@
+import hashlib
+import os
+import random
 import re  # Per le espressioni regolari nel parsing
-from itertools import combinations  # Per generare combinazioni di bottoni
-from ortools.linear_solver import pywraplp  # Solver per problemi di programmazione lineare
+import shelve  # Persistenza opzionale della cache delle soluzioni
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction  # Aritmetica razionale esatta per l'eliminazione di Gauss
+from itertools import repeat
+from math import lcm
 
 import utils  # Modulo personalizzato per leggere gli input
 
+# File di default per la cache persistente delle soluzioni (vedi SolutionCache)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(utils.input_path(10)), "solution_cache")
+
+# Solver riutilizzato da tutte le macchine risolte nello stesso processo
+_solver = None
+
+# Oltre questo numero di combinazioni delle variabili libere solve_min_presses passa a OR-Tools
+SEARCH_BOX_LIMIT = 100_000
+
+
+def get_solver() -> "pywraplp.Solver":
+    """
+    Restituisce il solver SCIP del processo corrente, svuotato e pronto per un nuovo modello.
+    Creare un solver è costoso: viene creato una sola volta e poi ripulito con Clear().
+    OR-Tools è opzionale e viene importato solo qui, la prima volta che serve.
+    """
+    global _solver
+    if _solver is None:
+        from ortools.linear_solver import pywraplp  # Solver per problemi di programmazione lineare
+        _solver = pywraplp.Solver.CreateSolver("SCIP")
+    else:
+        _solver.Clear()
+    return _solver
+
+
 class MachineConfiguration:
     """
     Rappresenta la configurazione di una macchina con bottoni e livelli di voltaggio.
@@ -20,67 +54,494 @@ class MachineConfiguration:
         """
         # Converte joltages in tupla (immutabile) per garantire che non venga modificato
         self.joltages = tuple(joltages)
-        self.toggles = []
 
-        # Converte ogni bottone in una rappresentazione binaria
-        # Esempio: se toggle = [0, 2] e ci sono 4 joltages, diventa [1, 0, 1, 0]
-        for toggle in toggles:
-            # Crea un array binario: 1 se l'indice è nel toggle, 0 altrimenti
-            binary_toggle = [int(i in toggle) for i, _ in enumerate(self.joltages)]
-            self.toggles.append(binary_toggle)
+        # Ogni bottone resta in forma sparsa: la tupla ordinata degli indici validi che influenza
+        # Esempio: se toggle = [0, 2] e ci sono 4 joltages, resta (0, 2)
+        buttons = [tuple(sorted({i for i in toggle if 0 <= i < len(self.joltages)})) for toggle in toggles]
 
         # Ordina i bottoni in ordine decrescente per numero di effetti
         # (bottoni che influenzano più posizioni vengono prima)
-        self.toggles = sorted(self.toggles, key=lambda x: -sum(x))
+        self.toggles = sorted(buttons, key=lambda x: -len(x))
 
-    def solve_with_linear_solver(self) -> tuple[int]:
+        # Incidenza inversa: per ogni posizione di voltaggio, i bottoni che la influenzano
+        self.incidence: list[list[int]] = [[] for _ in self.joltages]
+        for k, toggle in enumerate(self.toggles):
+            for j in toggle:
+                self.incidence[j].append(k)
+
+    def solve_with_linear_solver(self) -> int:
         """
         Risolve il problema di programmazione lineare intera per trovare il numero minimo
         di pressioni dei bottoni necessarie per raggiungere i livelli di voltaggio target.
 
+        Il modello viene costruito dall'incidenza sparsa: ogni vincolo riceve solo i
+        coefficienti non nulli, e il solver del processo viene riutilizzato.
+
         Returns:
             Il numero minimo totale di pressioni dei bottoni
         """
-        # Numero di variabili = numero di bottoni disponibili
-        number_of_variables = len(self.toggles)
-        # Numero di vincoli = numero di posizioni di voltaggio
-        number_of_constraints = len(self.joltages)
-
-        # Crea un solver SCIP (ottimizzatore per problemi di programmazione lineare intera)
-        solver = pywraplp.Solver.CreateSolver("SCIP")
+        solver = get_solver()
 
         # Crea una variabile intera non negativa per ogni bottone
         # x[k] rappresenta quante volte il bottone k viene premuto
         x = [
             solver.IntVar(0, solver.infinity(), f"x_{k}")
-            for k in range(number_of_variables)
+            for k in range(len(self.toggles))
         ]
 
         # Aggiungi un vincolo per ogni posizione di voltaggio
-        for j in range(number_of_constraints):
-            # La somma degli effetti di tutti i bottoni sulla posizione j
-            # deve essere uguale al voltaggio target per quella posizione
-            # Equazione: Σ(toggles[k][j] * x[k]) = joltages[j]
-            solver.Add(
-                sum(self.toggles[k][j] * x[k] for k in range(number_of_variables))
-                == self.joltages[j]
-            )
+        # Equazione: Σ(x[k] per i bottoni k che influenzano j) = joltages[j]
+        for j, buttons in enumerate(self.incidence):
+            constraint = solver.Constraint(self.joltages[j], self.joltages[j])
+            for k in buttons:
+                constraint.SetCoefficient(x[k], 1)
 
         # Obiettivo: minimizzare il numero totale di pressioni dei bottoni
-        solver.Minimize(solver.Sum(x))
+        objective = solver.Objective()
+        for variable in x:
+            objective.SetCoefficient(variable, 1)
+        objective.SetMinimization()
 
         # Risolve il problema di ottimizzazione
         status = solver.Solve()
 
         # Verifica se è stata trovata una soluzione ottimale
-        if status == pywraplp.Solver.OPTIMAL:
+        if status == solver.OPTIMAL:
             # Restituisce il valore ottimale (numero minimo di pressioni)
-            return solver.Objective().Value()
+            return round(objective.Value())
         else:
             # Se non esiste una soluzione, solleva un'eccezione
             print("No solution found.")
             raise ValueError
 
+    def solve_exact(self) -> int:
+        """
+        Risolve la macchina senza OR-Tools, con solve_min_presses.
+
+        Returns:
+            Il numero minimo totale di pressioni dei bottoni
+        """
+        return solve_min_presses(self.toggles, self.joltages)
+
+    def timed_solve(self, method: str = "exact", cache: "SolutionCache | None" = None) -> tuple[int, float]:
+        """
+        Risolve la macchina e misura il tempo impiegato.
+
+        Args:
+            method: "exact" per il solver interno, "ortools" per SCIP tramite OR-Tools
+            cache: Cache delle soluzioni da consultare e aggiornare (opzionale)
+
+        Returns:
+            Tupla (numero minimo di pressioni, secondi impiegati)
+        """
+        began = time.perf_counter()
+        if cache is not None:
+            pushes = cache.solve_joltages(self, method)
+        elif method == "ortools":
+            pushes = self.solve_with_linear_solver()
+        else:
+            pushes = self.solve_exact()
+        return pushes, time.perf_counter() - began
+
+
+def merge_buttons(toggles: list[tuple[int, ...]] | list[list[int]], width: int) -> list[tuple[int, ...]]:
+    """
+    Forma canonica dei bottoni: indici validi ordinati, bottoni ordinati, senza duplicati
+    e senza bottoni vuoti. Due bottoni con lo stesso insieme di indici diventano una sola
+    variabile; un bottone che non influenza nulla non serve mai premerlo.
+    """
+    return sorted({tuple(sorted({i for i in toggle if 0 <= i < width})) for toggle in toggles} - {()})
+
+
+def eliminate_layout(toggles: list[tuple[int, ...]], n_joltages: int) -> tuple[list[int], list[list[Fraction]], list[list[Fraction]]]:
+    """
+    Riduce a scala (forma ridotta di Gauss-Jordan) la sola matrice toggle, con aritmetica
+    razionale esatta, registrando le operazioni sulle righe in una matrice di trasformazione.
+
+    Non dipende dai voltaggi target: la stessa eliminazione vale per ogni target
+    della stessa disposizione di bottoni, che richiede allora solo un prodotto
+    matrice-vettore (transform × joltages).
+
+    Args:
+        toggles: Per ogni bottone, gli indici di voltaggio che influenza
+        n_joltages: Numero di posizioni di voltaggio
+
+    Returns:
+        (colonne pivot, righe ridotte, trasformazione): le prime len(pivot) righe della
+        trasformazione danno i termini noti delle righe ridotte, le altre devono dare 0
+        perché il sistema abbia soluzione
+    """
+    n_buttons = len(toggles)
+    # Ogni riga: coefficienti dei bottoni seguiti dalla riga della matrice identità
+    rows = [[Fraction(int(j in toggle)) for toggle in toggles] + [Fraction(int(i == j)) for i in range(n_joltages)]
+            for j in range(n_joltages)]
+    pivots = []
+    rank = 0
+    for column in range(n_buttons):
+        pivot = next((r for r in range(rank, len(rows)) if rows[r][column] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        factor = rows[rank][column]
+        rows[rank] = [value / factor for value in rows[rank]]
+        for r in range(len(rows)):
+            if r != rank and rows[r][column] != 0:
+                scale = rows[r][column]
+                rows[r] = [value - scale * base for value, base in zip(rows[r], rows[rank])]
+        pivots.append(column)
+        rank += 1
+    return pivots, [row[:n_buttons] for row in rows[:rank]], [row[n_buttons:] for row in rows]
+
+
+def rational_rref(toggles: list[tuple[int, ...]], joltages: tuple[int, ...],
+                  layout: tuple[list[int], list[list[Fraction]], list[list[Fraction]]] | None = None) -> tuple[list[int], list[list[Fraction]]]:
+    """
+    Riduce a scala il sistema toggle × pressioni = joltage con aritmetica razionale esatta.
+
+    Args:
+        toggles: Per ogni bottone, gli indici di voltaggio che influenza
+        joltages: Livelli di voltaggio target
+        layout: Eliminazione già calcolata da eliminate_layout per questi toggles (opzionale)
+
+    Returns:
+        (colonne pivot, righe ridotte): ogni riga ha len(toggles) coefficienti più il termine noto
+
+    Raises:
+        ValueError: Se il sistema non ha soluzione
+    """
+    pivots, reduced, transform = layout or eliminate_layout(toggles, len(joltages))
+    rhs = [sum(t * b for t, b in zip(row, joltages)) for row in transform]
+    # Righe nulle con termine noto diverso da zero: 0 = c, nessuna soluzione
+    if any(value != 0 for value in rhs[len(pivots):]):
+        raise ValueError("No solution found.")
+    return pivots, [row + [value] for row, value in zip(reduced, rhs)]
+
+
+def solve_min_presses(toggles: list[tuple[int, ...]], joltages: tuple[int, ...],
+                      layout: tuple[list[int], list[list[Fraction]], list[list[Fraction]]] | None = None) -> int:
+    """
+    Minimo di Σx tra le soluzioni intere x >= 0 di toggle × x = joltage, senza OR-Tools.
+
+    I bottoni con lo stesso insieme di indici vengono prima fusi in un'unica variabile
+    (vedi merge_buttons): premere l'uno o l'altro ha lo stesso effetto e lo stesso costo.
+    Dopo l'eliminazione razionale ogni variabile pivot è una funzione affine delle
+    variabili libere: x_p = (c_p - Σ a_pf · x_f) / d_p, con interi ottenuti moltiplicando
+    ogni riga per il minimo comune denominatore d_p. Si cercano allora solo i valori
+    delle variabili libere con una ricerca in profondità: ogni variabile è limitata dal
+    voltaggio che resta sui suoi indici dopo le variabili già fissate, e si scartano i
+    rami in cui una variabile pivot non può più restare >= 0 o in cui il totale non può
+    migliorare il migliore. Se lo spazio iniziale delle variabili libere supera
+    SEARCH_BOX_LIMIT, il sistema passa a OR-Tools o, se non è installato, a
+    min_presses_halving, il cui costo non dipende dalla dimensione di quello spazio.
+    Se layout (da eliminate_layout) è indicato, deve riferirsi ai bottoni già fusi.
+
+    Raises:
+        ValueError: Se il sistema non ha soluzione intera non negativa
+
+    Anche senza OR-Tools una macchina con molte combinazioni delle variabili libere
+    si risolve in fretta:
+
+    >>> from unittest import mock
+    >>> with mock.patch.dict("sys.modules", {"ortools": None}), mock.patch(f"{__name__}._solver", None):
+    ...     solve_min_presses([(0, 2), (0, 1, 3, 2), (2,), (0, 1), (3, 0, 1, 2), (2,), (3,), (2, 1, 3),
+    ...                        (3, 0), (2, 3), (1,), (2, 1, 0)], (120, 137, 198, 110))
+    198
+    """
+    toggles = merge_buttons(toggles, len(joltages))
+    pivots, rows = rational_rref(toggles, joltages, layout)
+    pivot_set = set(pivots)
+    free = [k for k in range(len(toggles)) if k not in pivot_set]
+    free_indices = [toggles[f] for f in free]
+
+    # Spazio di ricerca iniziale: se è troppo grande conviene il solver lineare intero
+    box = 1
+    for indices in free_indices:
+        box *= min(joltages[j] for j in indices) + 1
+    if box > SEARCH_BOX_LIMIT:
+        try:
+            return MachineConfiguration([list(toggle) for toggle in toggles], joltages).solve_with_linear_solver()
+        except ImportError:
+            # OR-Tools non installato: metodo esatto con costo limitato al posto della ricerca
+            presses = min_presses_halving(toggles, joltages)
+            if presses == float('inf'):
+                raise ValueError("No solution found.")
+            return presses
+
+    # Righe intere: d · x_p = c - Σ a_f · x_f
+    equations = []
+    for row in rows:
+        scale = lcm(*(value.denominator for value in row))
+        equations.append((int(row[-1] * scale), [int(row[f] * scale) for f in free], scale))
+
+    # Σx = costante + Σ peso_f · x_f (la costante e i pesi restano razionali)
+    constant = sum(Fraction(c, d) for c, _, d in equations)
+    weights = [1 - sum(Fraction(a[i], d) for _, a, d in equations) for i in range(len(free))]
+
+    best = None
+    # Voltaggio ancora disponibile per ogni indice, tolte le pressioni delle variabili libere fissate
+    left = list(joltages)
+
+    def search(level: int, partial: list[int], objective: Fraction) -> None:
+        nonlocal best
+        if level == len(free):
+            if objective.denominator != 1 or (best is not None and objective >= best):
+                return
+            if all(rest % d == 0 and rest >= 0 for rest, (_, _, d) in zip(partial, equations)):
+                best = int(objective)
+            return
+        # Ogni pressione aumenta di 1 tutti i voltaggi del bottone: non può superare quanto resta
+        bounds = [min(left[j] for j in indices) for indices in free_indices[level:]]
+        # Limite inferiore dell'obiettivo con le variabili libere rimanenti
+        lower = objective + sum(min(Fraction(0), weights[level + i] * bound) for i, bound in enumerate(bounds))
+        if best is not None and lower >= best:
+            return
+        indices = free_indices[level]
+        for value in range(bounds[0] + 1):
+            remaining = [rest - a[level] * value for rest, (_, a, _) in zip(partial, equations)]
+            # Ogni pivot deve poter restare >= 0 usando al meglio le variabili libere rimanenti
+            if all(rest - sum(min(0, a[level + i]) * bound for i, bound in enumerate(bounds) if i) >= 0
+                   for rest, (_, a, _) in zip(remaining, equations)):
+                for j in indices:
+                    left[j] -= value
+                search(level + 1, remaining, objective + weights[level] * value)
+                for j in indices:
+                    left[j] += value
+
+    search(0, [c for c, _, _ in equations], constant)
+    if best is None:
+        raise ValueError("No solution found.")
+    return best
+
+
+def min_presses_halving(toggles: list[tuple[int, ...]], joltages: tuple[int, ...]) -> int | float:
+    """
+    Minimo di Σx tra le soluzioni intere x >= 0 di toggle × x = joltage, per dimezzamenti.
+
+    In ogni soluzione i bottoni premuti un numero dispari di volte formano un insieme S
+    il cui effetto ha la stessa parità del target: S è una soluzione su GF(2)
+    (gf2_eliminate). Tolto l'effetto di S il resto è pari e le pressioni rimanenti sono
+    il doppio di una soluzione per il target dimezzato:
+    f(t) = min su S di |S| + 2 · f((t - effetto(S)) / 2), con f(0) = 0.
+    Ogni livello dimezza i voltaggi, quindi la profondità è log2(max voltaggio) e ogni
+    livello prova al più 2^(bottoni liberi su GF(2)) insiemi S, qualunque sia il target.
+
+    Returns:
+        Il numero minimo di pressioni, float('inf') se il sistema non ha soluzione
+
+    >>> min_presses_halving([(3,), (1, 3), (2,), (2, 3), (0, 2), (0, 1)], (3, 5, 4, 7))
+    10
+    """
+    width = len(joltages)
+    masks = [to_bitmask(list(toggle), width) for toggle in toggles]
+    # Per ogni parità del target: (|S|, effetto di S) di tutte le soluzioni su GF(2)
+    choices: dict[int, list[tuple[int, tuple[int, ...]]]] = {}
+    best: dict[tuple[int, ...], int | float] = {}
+
+    def parity_choices(parity: int) -> list[tuple[int, tuple[int, ...]]]:
+        if parity not in choices:
+            solved = gf2_eliminate(masks, parity, width)
+            options = []
+            if solved is not None:
+                particular, null_space = solved
+                current = particular
+                for step in range(1 << len(null_space)):
+                    if step:
+                        current ^= null_space[(step & -step).bit_length() - 1]
+                    effect = [0] * width
+                    for button in bitmask_indices(current):
+                        for j in toggles[button]:
+                            effect[j] += 1
+                    options.append((current.bit_count(), tuple(effect)))
+            choices[parity] = options
+        return choices[parity]
+
+    def presses(target: tuple[int, ...]) -> int | float:
+        if not any(target):
+            return 0
+        if target not in best:
+            result = float('inf')
+            parity = to_bitmask([j for j, value in enumerate(target) if value & 1], width)
+            for count, effect in parity_choices(parity):
+                if all(e <= t for e, t in zip(effect, target)):
+                    half = tuple((t - e) // 2 for t, e in zip(target, effect))
+                    result = min(result, count + 2 * presses(half))
+            best[target] = result
+        return best[target]
+
+    return presses(tuple(joltages))
+
+
+def solve_batch(manuals: list[MachineConfiguration], workers: int | None = None, chunksize: int = 8,
+                method: str = "exact", cache: "SolutionCache | None" = None) -> list[tuple[int, float]]:
+    """
+    Risolve un lotto di macchine, in parallelo su più processi se workers > 1.
+
+    Ogni processo riutilizza il proprio solver (vedi get_solver); i risultati
+    tornano nello stesso ordine delle macchine, con il tempo di risoluzione di
+    ognuna per individuare i casi anomali.
+
+    Args:
+        manuals: Configurazioni delle macchine da risolvere
+        workers: Numero di processi (None = numero di core, 1 = processo corrente)
+        chunksize: Macchine inviate a un processo per ogni richiesta
+        method: "exact" per il solver interno, "ortools" per SCIP tramite OR-Tools
+        cache: Cache delle soluzioni (opzionale): le macchine già viste non vengono
+            risolte di nuovo e, con più processi, le macchine ripetute nel lotto
+            vengono risolte una sola volta
+
+    Returns:
+        Lista di tuple (numero minimo di pressioni, secondi impiegati)
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [manual.timed_solve(method, cache) for manual in manuals]
+    if cache is not None:
+        # La cache resta nel processo principale: ai processi vanno solo le macchine mancanti
+        results: list[tuple[int, float] | None] = [None] * len(manuals)
+        keys = [cache.joltages_key(manual) for manual in manuals]
+        missing: dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key in missing:
+                cache.hits += 1
+                continue
+            began = time.perf_counter()
+            pushes = cache.get(key)
+            if pushes is None:
+                missing[key] = i
+            else:
+                results[i] = (pushes, time.perf_counter() - began)
+        solved = dict(zip(missing, solve_batch([manuals[i] for i in missing.values()], workers, chunksize, method)))
+        for key, (pushes, _) in solved.items():
+            cache.put(key, pushes)
+        return [result if result is not None else solved[key] for result, key in zip(results, keys)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(MachineConfiguration.timed_solve, manuals, repeat(method), chunksize=chunksize))
+
+class SolutionCache:
+    """
+    Cache delle soluzioni indicizzata per contenuto, con politica LRU.
+
+    La chiave è l'impronta della disposizione canonica dei bottoni (bottoni ordinati,
+    ognuno come tupla ordinata di indici) insieme al vettore target: macchine identiche
+    scritte con i bottoni in un altro ordine condividono la stessa voce. Per ogni
+    disposizione viene conservata anche l'eliminazione di Gauss (eliminate_layout),
+    così un nuovo target della stessa disposizione richiede solo la sostituzione.
+    Con path le voci vengono salvate anche su disco tramite shelve.
+    """
+
+    def __init__(self, maxsize: int = 4096, path: str | None = None):
+        """
+        Args:
+            maxsize: Numero massimo di voci in memoria per soluzioni e per eliminazioni
+            path: File shelve per la persistenza (es. DEFAULT_CACHE_PATH), None = solo memoria
+        """
+        self.maxsize = maxsize
+        self.solutions: OrderedDict[str, int | float] = OrderedDict()
+        self.layouts: OrderedDict[str, tuple] = OrderedDict()
+        self.store = shelve.open(path) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "SolutionCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Chiude il file su disco, se presente."""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    @staticmethod
+    def layout_key(buttons: list[list[int]] | list[tuple[int, ...]], width: int) -> tuple[tuple[tuple[int, ...], ...], str]:
+        """
+        Restituisce (bottoni in forma canonica, impronta SHA-1) di una disposizione di bottoni.
+        Gli indici fuori da [0, width) vengono ignorati e i bottoni duplicati fusi (vedi merge_buttons).
+        """
+        canonical = tuple(merge_buttons(buttons, width))
+        digest = hashlib.sha1(repr((width, canonical)).encode()).hexdigest()
+        return canonical, digest
+
+    def _get(self, entries: OrderedDict, key: str):
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+        if self.store is not None and key in self.store:
+            value = self.store[key]
+            self._put(entries, key, value, persist=False)
+            return value
+        return None
+
+    def _put(self, entries: OrderedDict, key: str, value, persist: bool = True) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        # Elimina la voce usata meno di recente
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        if persist and self.store is not None:
+            self.store[key] = value
+
+    def get(self, key: str) -> int | float | None:
+        """Soluzione memorizzata per key (None se assente), aggiornando i contatori."""
+        value = self._get(self.solutions, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: int | float) -> None:
+        """Memorizza la soluzione per key."""
+        self._put(self.solutions, key, value)
+
+    def _solve(self, key: str, solve):
+        value = self.get(key)
+        if value is None:
+            value = solve()
+            self.put(key, value)
+        return value
+
+    def solve_machine(self, target: list[int], buttons: list[list[int]]) -> int | float:
+        """Come solve_machine (parte 1), riutilizzando le soluzioni già calcolate."""
+        canonical, digest = self.layout_key(buttons, len(target))
+        key = f"lights:{digest}:{''.join(map(str, target))}"
+        return self._solve(key, lambda: solve_machine(target, [list(button) for button in canonical]))
+
+    def layout(self, canonical: tuple[tuple[int, ...], ...], digest: str, width: int) -> tuple:
+        """Eliminazione di Gauss della disposizione, calcolata una sola volta."""
+        key = f"layout:{digest}"
+        value = self._get(self.layouts, key)
+        if value is None:
+            value = eliminate_layout(list(canonical), width)
+            self._put(self.layouts, key, value)
+        return value
+
+    def solve_machine_bitmask(self, target_mask: int, button_masks: list[int], n_lights: int) -> int | float:
+        """Come solve_machine_bitmask (parte 1), riutilizzando le soluzioni già calcolate."""
+        target = [target_mask >> i & 1 for i in range(n_lights)]
+        return self.solve_machine(target, [bitmask_indices(mask) for mask in button_masks])
+
+    def joltages_key(self, manual: MachineConfiguration) -> str:
+        """Chiave della soluzione di una macchina della parte 2."""
+        _, digest = self.layout_key(manual.toggles, len(manual.joltages))
+        return f"joltages:{digest}:{','.join(map(str, manual.joltages))}"
+
+    def solve_joltages(self, manual: MachineConfiguration, method: str = "exact") -> int:
+        """
+        Come MachineConfiguration.timed_solve senza il tempo, riutilizzando soluzioni
+        ed eliminazioni. Il risultato non dipende da method, quindi la chiave è la stessa.
+        """
+        width = len(manual.joltages)
+        canonical, digest = self.layout_key(manual.toggles, width)
+        key = f"joltages:{digest}:{','.join(map(str, manual.joltages))}"
+        if method == "ortools":
+            return self._solve(key, manual.solve_with_linear_solver)
+        return self._solve(key, lambda: solve_min_presses(list(canonical), manual.joltages,
+                                                           self.layout(canonical, digest, width)))
+
+
 def map_fn(machine: str) -> tuple[str, str, str]:
     """
     Divide una stringa di input della macchina in tre componenti.
@@ -125,10 +586,148 @@ def parse_machine(indicator_light_diagram: str, config: str, joltage: str) -> tu
 
     return target, buttons, joltage_levels
 
+def to_bitmask(indices: list[int], width: int) -> int:
+    """
+    Converte una lista di indici in una maschera di bit (bit i acceso se i è nella lista).
+    Gli indici fuori da [0, width) vengono ignorati.
+
+    Esempio: to_bitmask([0, 2], 4) -> 0b0101
+    """
+    mask = 0
+    for index in indices:
+        if 0 <= index < width:
+            mask |= 1 << index
+    return mask
+
+
+def gf2_eliminate(button_masks: list[int], target_mask: int, n_lights: int) -> tuple[int, list[int]] | None:
+    """
+    Risolve il sistema lineare su GF(2): XOR dei bottoni premuti = target.
+
+    Ogni luce è un'equazione, memorizzata come maschera sui bottoni più il bit
+    del termine noto. L'eliminazione di Gauss-Jordan usa solo XOR tra interi.
+
+    Args:
+        button_masks: Maschera delle luci influenzate da ogni bottone
+        target_mask: Maschera dello stato desiderato delle luci
+        n_lights: Numero di luci
+
+    Returns:
+        (soluzione particolare, base dello spazio nullo) come maschere sui bottoni,
+        oppure None se il sistema non ha soluzione
+    """
+    n_buttons = len(button_masks)
+    # Riga i: bottoni che influenzano la luce i, con il termine noto nel bit n_buttons
+    rows = []
+    for light in range(n_lights):
+        row = 0
+        for button, mask in enumerate(button_masks):
+            if mask >> light & 1:
+                row |= 1 << button
+        rows.append(row | (target_mask >> light & 1) << n_buttons)
+
+    pivots = []  # (colonna pivot, riga ridotta)
+    for column in range(n_buttons):
+        pivot = next((r for r in rows if r >> column & 1), None)
+        if pivot is None:
+            continue
+        rows.remove(pivot)
+        # Elimina la colonna da tutte le altre righe (anche dai pivot già trovati)
+        rows = [r ^ pivot if r >> column & 1 else r for r in rows]
+        pivots = [(c, r ^ pivot if r >> column & 1 else r) for c, r in pivots]
+        pivots.append((column, pivot))
+
+    # Una riga rimasta con solo il termine noto significa 0 = 1: nessuna soluzione
+    if any(rows):
+        return None
+
+    particular = 0
+    for column, row in pivots:
+        if row >> n_buttons & 1:
+            particular |= 1 << column
+
+    pivot_columns = {column for column, _ in pivots}
+    null_space = []
+    for free in range(n_buttons):
+        if free in pivot_columns:
+            continue
+        vector = 1 << free
+        for column, row in pivots:
+            if row >> free & 1:
+                vector |= 1 << column
+        null_space.append(vector)
+    return particular, null_space
+
+
+def min_presses_null_space(particular: int, null_space: list[int]) -> int:
+    """
+    Peso minimo (numero di bottoni premuti) tra tutte le soluzioni particular + span(null_space).
+    Scorre le 2^k combinazioni in codice Gray: ogni passo costa un solo XOR.
+    """
+    current = particular
+    best = current.bit_count()
+    for step in range(1, 1 << len(null_space)):
+        # In codice Gray cambia il bit meno significativo acceso di step
+        current ^= null_space[(step & -step).bit_length() - 1]
+        best = min(best, current.bit_count())
+    return best
+
+
+def min_presses_meet_in_the_middle(target_mask: int, button_masks: list[int]) -> int:
+    """
+    Peso minimo con meet-in-the-middle: per la prima metà dei bottoni memorizza, per ogni
+    effetto ottenibile, il minimo numero di pressioni; per la seconda metà cerca l'effetto
+    complementare. Costo O(2^(B/2)) invece di O(2^B).
+    """
+    half = len(button_masks) // 2
+
+    def effects(masks: list[int]) -> dict[int, int]:
+        # effetto -> minimo numero di bottoni, enumerando i sottoinsiemi in codice Gray
+        best = {0: 0}
+        current, pressed = 0, 0
+        for step in range(1, 1 << len(masks)):
+            bit = (step & -step).bit_length() - 1
+            current ^= masks[bit]
+            pressed ^= 1 << bit
+            count = pressed.bit_count()
+            if count < best.get(current, count + 1):
+                best[current] = count
+        return best
+
+    left = effects(button_masks[:half])
+    right = effects(button_masks[half:])
+    best = float('inf')
+    for effect, count in right.items():
+        other = left.get(target_mask ^ effect)
+        if other is not None:
+            best = min(best, count + other)
+    return best
+
+
+def solve_machine_bitmask(target_mask: int, button_masks: list[int], n_lights: int) -> int | float:
+    """
+    Numero minimo di bottoni da premere (ognuno al più una volta) per accendere target_mask.
+
+    Dopo l'eliminazione su GF(2) restano k bottoni liberi: se 2^k è piccolo si enumera
+    solo lo spazio nullo, altrimenti si usa il meet-in-the-middle sui bottoni.
+
+    Returns:
+        Il numero minimo di pressioni, float('inf') se il target non è raggiungibile
+    """
+    solution = gf2_eliminate(button_masks, target_mask, n_lights)
+    if solution is None:
+        return float('inf')
+    particular, null_space = solution
+    if len(null_space) <= (len(button_masks) + 1) // 2:
+        return min_presses_null_space(particular, null_space)
+    return min_presses_meet_in_the_middle(target_mask, button_masks)
+
+
 def solve_machine(target, buttons):
     """
     Trova il minimo numero di pressioni dei bottoni necessarie per raggiungere lo stato target.
-    Utilizza un approccio a forza bruta testando tutte le combinazioni possibili.
+    Luci e bottoni vengono convertiti in maschere di bit e il problema è risolto come
+    sistema lineare su GF(2) da solve_machine_bitmask.
 
     Args:
         target: Lista binaria che rappresenta lo stato desiderato delle luci
@@ -139,116 +738,152 @@ def solve_machine(target, buttons):
     """
     # Numero totale di luci nella macchina
     n_lights = len(target)
+    target_mask = to_bitmask([i for i, light in enumerate(target) if light], n_lights)
+    button_masks = [to_bitmask(button, n_lights) for button in buttons]
+    return solve_machine_bitmask(target_mask, button_masks, n_lights)
+
 
-    # Prova tutte le combinazioni possibili di bottoni
-    # Inizia da 0 bottoni fino a tutti i bottoni disponibili
-    for n_buttons in range(len(buttons) + 1):
-        # Genera tutte le combinazioni di n_buttons bottoni dalla lista di bottoni
-        for combo in combinations(range(len(buttons)), n_buttons):
-            # Simula la pressione di questi bottoni
-            # Inizializza lo stato con tutte le luci spente
-            state = [0] * n_lights
+# Tabella per convertire il diagramma delle luci in cifre binarie: '#' -> '1', '.' -> '0'
+LIGHTS_TO_BITS = str.maketrans("#.", "10")
 
-            # Per ogni bottone nella combinazione corrente
-            for button_idx in combo:
-                # Per ogni luce influenzata da questo bottone
-                for light_idx in buttons[button_idx]:
-                    # Verifica che l'indice sia valido
-                    if light_idx < n_lights:
-                        # XOR toggle: inverte lo stato della luce
-                        # 0 -> 1 (spenta -> accesa), 1 -> 0 (accesa -> spenta)
-                        state[light_idx] ^= 1
 
-            # Controlla se lo stato corrente corrisponde al target
-            if state == target:
-                # Trovata la soluzione con il minor numero di pressioni
-                return n_buttons
+def bitmask_indices(mask: int) -> list[int]:
+    """Restituisce gli indici dei bit accesi di mask, in ordine crescente (es.: 0b101 -> [0, 2])."""
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
 
-    # Non dovrebbe mai arrivare qui se il puzzle ha una soluzione
-    return float('inf')  # Infinito indica che non è stata trovata una soluzione
 
+def parse_machines(text: str) -> list[tuple[int, int, list[int], array]]:
+    """
+    Converte tutto l'input in strutture compatte, senza espressioni regolari.
+
+    Ogni riga viene scandita una sola volta, token per token: il primo carattere
+    dice se si tratta del diagramma "[...]", di un bottone "(...)" o dei voltaggi "{...}".
+
+    Args:
+        text: Contenuto completo del file, una macchina per riga
 
-def part_1(machines: list[tuple[str, str, str]]) -> None:
+    Returns:
+        Lista di tuple (numero di luci, maschera target, maschere dei bottoni, array dei voltaggi)
+    """
+    machines = []
+    # Bottoni e diagrammi si ripetono molto tra le righe: ogni token distinto viene convertito una volta
+    button_cache: dict[str, int] = {}
+    for line in text.splitlines():
+        n_lights, target_mask, button_masks, joltages = 0, 0, [], array("q")
+        for token in line.split():
+            kind = token[0]
+            if kind == "(":
+                mask = button_cache.get(token)
+                if mask is None:
+                    mask = 0
+                    for index in token[1:-1].split(","):
+                        mask |= 1 << int(index)
+                    button_cache[token] = mask
+                button_masks.append(mask)
+            elif kind == "[":
+                n_lights = len(token) - 2
+                # Il bit i corrisponde alla luce i: si legge il diagramma al contrario
+                target_mask = int(token[-2:0:-1].translate(LIGHTS_TO_BITS) or "0", 2)
+            elif kind == "{":
+                joltages = array("q", map(int, token[1:-1].split(",")))
+        if line.strip():
+            machines.append((n_lights, target_mask, button_masks, joltages))
+    return machines
+
+
+def benchmark_parse(n_lines: int = 1_000_000, seed: int = 0) -> float:
+    """
+    Misura la velocità di parse_machines in macchine al secondo su un input sintetico
+    di n_lines righe, confrontandola con il percorso map_fn + parse_machine.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n_lines):
+        n_lights = rng.randint(4, 10)
+        diagram = "".join(rng.choice("#.") for _ in range(n_lights))
+        buttons = " ".join("(" + ",".join(map(str, sorted(rng.sample(range(n_lights), rng.randint(1, n_lights))))) + ")"
+                           for _ in range(rng.randint(3, 13)))
+        joltages = ",".join(str(rng.randint(0, 300)) for _ in range(n_lights))
+        lines.append(f"[{diagram}] {buttons} {{{joltages}}}")
+    text = "\n".join(lines)
+
+    began = time.perf_counter()
+    parse_machines(text)
+    throughput = n_lines / (time.perf_counter() - began)
+
+    began = time.perf_counter()
+    for line in lines:
+        parse_machine(*map_fn(line))
+    baseline = n_lines / (time.perf_counter() - began)
+
+    print(f"parse_machines: {throughput:,.0f} macchine/s (regex: {baseline:,.0f} macchine/s)")
+    return throughput
+
+
+def part_1(machines: list[tuple[int, int, list[int], array]], cache: SolutionCache | None = None) -> None:
     """
     Risolve la parte 1 del puzzle: trova il numero totale di pressioni di bottoni
-    necessarie per tutte le macchine usando l'approccio a forza bruta.
+    necessarie per tutte le macchine risolvendo ogni sistema su GF(2).
 
     Args:
-        machines: Lista di tuple, ognuna contenente (diagramma_luci, configurazione, voltaggio)
+        machines: Macchine in forma compatta, come restituite da parse_machines
+        cache: Cache delle soluzioni (opzionale), per non risolvere di nuovo le macchine ripetute
     """
+    solve = solve_machine_bitmask if cache is None else cache.solve_machine_bitmask
+
     # Contatore per il numero totale di pressioni di tutti i bottoni
     total_presses = 0
 
     # Per ogni macchina nell'input
-    for machine in machines:
-        # Separa i tre componenti della macchina
-        indicator_light_diagram, config, joltage = machine
-
-        # Parsing dei componenti per estrarre i dati strutturati
-        # target: stato desiderato delle luci
-        # buttons: quali luci ogni bottone influenza
-        # joltage_level: livelli di voltaggio (non usati nella parte 1)
-        target, buttons, joltage_level = parse_machine(indicator_light_diagram, config, joltage)
-
-        # Trova il numero minimo di pressioni per questa macchina
-        min_presses = solve_machine(target, buttons)
-
-        # Aggiungi al totale
-        total_presses += min_presses
+    for n_lights, target_mask, button_masks, _ in machines:
+        # Trova il numero minimo di pressioni per questa macchina direttamente dalle maschere
+        total_presses += solve(target_mask, button_masks, n_lights)
 
     # Stampa il risultato finale
     print(f"Result part 1", total_presses)
 
 
-def part_2(machines: list[tuple[str, str, str]]) -> None:
+def part_2(machines: list[tuple[int, int, list[int], array]], cache: SolutionCache | None = None) -> None:
     """
     Risolve la parte 2 del puzzle: trova il numero totale di pressioni di bottoni
     necessarie per tutte le macchine usando la programmazione lineare intera.
 
     Args:
-        machines: Lista di tuple, ognuna contenente (diagramma_luci, configurazione, voltaggio)
+        machines: Macchine in forma compatta, come restituite da parse_machines
+        cache: Cache delle soluzioni (opzionale), per non risolvere di nuovo le macchine ripetute
     """
-    # Lista per contenere le configurazioni di tutte le macchine
-    manuals: list[MachineConfiguration] = []
-
-    # Per ogni macchina nell'input
-    for machine in machines:
-        # Separa i tre componenti della macchina
-        indicator_light_diagram, config, joltage = machine
-
-        # Parsing dei componenti per estrarre i dati strutturati
-        # target: stato desiderato delle luci (non usato nella parte 2)
-        # buttons: quali posizioni ogni bottone influenza
-        # joltage_level: livelli di voltaggio target
-        target, buttons, joltage_level = parse_machine(indicator_light_diagram, config, joltage)
-
-        # Crea una configurazione macchina per il solver di programmazione lineare
-        # Questa usa i livelli di voltaggio invece dello stato binario delle luci
-        manuals.append(MachineConfiguration(buttons, joltage_level))
-
-    # Lista per memorizzare le soluzioni di ogni macchina
-    solutions = []
-
-    # Risolvi ogni macchina usando il solver di programmazione lineare
-    for manual in manuals:
-        # Trova il numero minimo di pressioni usando l'ottimizzatore
-        pushes = manual.solve_with_linear_solver()
-        # Aggiungi alla lista delle soluzioni
-        solutions.append(pushes)
+    # Crea una configurazione per ogni macchina: i bottoni tornano liste di indici
+    # e si usano i livelli di voltaggio invece dello stato binario delle luci
+    manuals = [MachineConfiguration([bitmask_indices(mask) for mask in button_masks], joltages)
+               for _, _, button_masks, joltages in machines]
+
+    # Risolvi tutte le macchine in blocco usando il solver di programmazione lineare
+    # e tieni traccia del tempo impiegato da ognuna
+    results = solve_batch(manuals, cache=cache)
+    solutions = [pushes for pushes, _ in results]
+    slowest = max(range(len(results)), key=lambda i: results[i][1], default=None)
+    if slowest is not None:
+        print(f"Slowest machine: #{slowest} in {results[slowest][1]:.3f}s")
 
     # Calcola la somma totale di tutte le pressioni e stampala
-    # int() per convertire da float a intero
-    print(f"Result part 2: {int(sum(solutions))}")
+    print(f"Result part 2: {sum(solutions)}")
 
 
 if __name__ == "__main__":
-    # Legge i dati di input per il giorno 10
-    # map_fn viene usata per processare ogni linea dell'input
+    # Legge i dati di input per il giorno 10 in un'unica lettura e li converte in forma compatta
     # False = usa l'input reale (day_10.txt), True = usa l'esempio (day_10_example.txt)
-    data = utils.read_input(10, map_fn, False)
+    data = parse_machines(utils.read_input_entire_str(10, False))
 
-    # Esegue la parte 1: approccio a forza bruta con combinazioni
-    part_1(data)
+    # Cache in memoria condivisa dalle due parti: le macchine ripetute si risolvono una volta
+    # (SolutionCache(path=DEFAULT_CACHE_PATH) la conserva anche tra un'esecuzione e l'altra)
+    with SolutionCache() as cache:
+        # Esegue la parte 1: sistema lineare su GF(2) con maschere di bit
+        part_1(data, cache)
 
-    # Esegue la parte 2: approccio con programmazione lineare intera
-    part_2(data)
\ No newline at end of file
+        # Esegue la parte 2: sistema lineare intero sui voltaggi
+        part_2(data, cache)
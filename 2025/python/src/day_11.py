@@ -1,4 +1,5 @@
 import utils  # Modulo personalizzato per leggere gli input
+from array import array
 from collections import deque
 
 def map_fn(line_devices: str) -> tuple[str, set[str]]:
@@ -9,72 +10,170 @@ def map_fn(line_devices: str) -> tuple[str, set[str]]:
     return parent, children
 
 
-def create_graph(list_of_devices: list[tuple[str, set[str]]]) -> dict[str, set[str]]:
-    # Crea un dizionario, per rappresentare un grafo, dove ogni dispositivo (chiave) punta ai suoi figli (set di nodi)
-    circuit = {}
-    for device in list_of_devices:
-        circuit[device[0]] = device[1]
-    return circuit
-
-
-# DFS (Depth-First Search) per tracciare tutti i percorsi possibili.
-def dfs(circuit: dict[str, set[str]], start:str, end:str, cache:dict) -> int:    # Controlla se il risultato è già in cache per evitare ricalcoli
-    if (start, end) in cache:
-        return cache[(start, end)]
-
-    # Caso base: se siamo arrivati alla destinazione, c'è 1 percorso
-    if start == end:
-        return 1
-
-    # Somma ricorsivamente tutti i percorsi possibili dai nodi figli
-    possibilities = sum([dfs(circuit, node, end, cache) for node in circuit.get(start, {})])
-
-    # Memorizza il risultato nella cache
-    cache[(start, end)] = possibilities
-    return possibilities
+class DeviceGraph:
+    # Grafo compatto: ogni dispositivo è internato in un intero denso (0..n-1)
+    # e l'adiacenza è in formato CSR: i figli del nodo i sono
+    # targets[offsets[i]:offsets[i + 1]]
+    def __init__(self, list_of_devices: list[tuple[str, set[str]]]):
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+        # Prima passata: interna i nomi e raccoglie i figli di ogni genitore;
+        # se un genitore compare più volte vale l'ultima riga, come nel vecchio dizionario
+        edges: dict[int, list[int]] = {}
+        for parent, children in list_of_devices:
+            edges[self.intern(parent)] = [self.intern(child) for child in children]
+        degree = [0] * len(self.names)
+        for parent, children in edges.items():
+            degree[parent] = len(children)
+        # Seconda passata: somme prefisse dei gradi e riempimento dei target
+        self.offsets = array("q", [0]) * (len(self.names) + 1)
+        for node, count in enumerate(degree):
+            self.offsets[node + 1] = self.offsets[node] + count
+        self.targets = array("q", [0]) * self.offsets[-1]
+        for parent, children in edges.items():
+            start = self.offsets[parent]
+            self.targets[start:start + len(children)] = array("q", children)
+
+    def intern(self, name: str) -> int:
+        # Restituisce l'id del dispositivo, assegnandone uno nuovo se non esiste
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def children(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+
+def create_graph(list_of_devices: list[tuple[str, set[str]]]) -> DeviceGraph:
+    # Crea il grafo compatto del circuito
+    return DeviceGraph(list_of_devices)
+
+
+class CycleError(ValueError):
+    # Sollevata quando il grafo raggiungibile contiene un ciclo: i percorsi sarebbero infiniti
+    def __init__(self, cycle: list[str]):
+        self.cycle = cycle
+        super().__init__(f"Cycle detected: {' -> '.join(cycle)}")
+
+
+def find_cycle(circuit: DeviceGraph, nodes: set[int]) -> list[str]:
+    # Nei nodi rimasti dopo Kahn ogni nodo ha un predecessore tra i rimasti:
+    # risalendo all'indietro prima o poi si ritorna su un nodo già visto
+    offsets, targets = circuit.offsets, circuit.targets
+    parents = {}
+    for node in nodes:
+        for edge in range(offsets[node], offsets[node + 1]):
+            if targets[edge] in nodes:
+                parents.setdefault(targets[edge], node)
+    node = next(iter(nodes))
+    seen = {}
+    path = []
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = parents[node]
+    cycle = [circuit.names[node] for node in path[seen[node]:][::-1]]
+    return cycle + [cycle[0]]
+
+
+def topological_order(circuit: DeviceGraph, sources: list[int]) -> list[int]:
+    # Ordine topologico (algoritmo di Kahn, iterativo) dei nodi raggiungibili dalle sorgenti
+    offsets, targets = circuit.offsets, circuit.targets
+    reachable = bytearray(len(circuit))
+    frontier = deque(sources)
+    for node in sources:
+        reachable[node] = 1
+    # Grado entrante di ogni nodo, contando solo gli archi tra nodi raggiungibili
+    in_degree = [0] * len(circuit)
+    while frontier:
+        node = frontier.popleft()
+        for child in targets[offsets[node]:offsets[node + 1]]:
+            in_degree[child] += 1
+            if not reachable[child]:
+                reachable[child] = 1
+                frontier.append(child)
+
+    order = []
+    frontier = deque(node for node in range(len(circuit)) if reachable[node] and in_degree[node] == 0)
+    while frontier:
+        node = frontier.popleft()
+        order.append(node)
+        for child in targets[offsets[node]:offsets[node + 1]]:
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                frontier.append(child)
+
+    # Se qualche nodo non è stato ordinato, fa parte di un ciclo (o ne dipende)
+    if len(order) < reachable.count(1):
+        raise CycleError(find_cycle(circuit, {node for node in range(len(circuit)) if in_degree[node] > 0}))
+    return order
+
+
+def count_paths_from(circuit: DeviceGraph, source: str, order: list[int] | None = None) -> list[int]:
+    # Numero di percorsi da source verso ogni nodo (indicizzato per id), con una sola passata
+    # in ordine topologico: i percorsi verso un nodo si propagano ai suoi figli
+    offsets, targets = circuit.offsets, circuit.targets
+    paths = [0] * len(circuit)
+    start = circuit.ids.get(source)
+    if start is None:
+        return paths
+    if order is None:
+        order = topological_order(circuit, [start])
+    paths[start] = 1
+    for node in order:
+        count = paths[node]
+        if count:
+            for child in targets[offsets[node]:offsets[node + 1]]:
+                paths[child] += count
+    return paths
+
+
+def count_paths_between(circuit: DeviceGraph, waypoints: list[str]) -> dict[tuple[str, str], int]:
+    # Percorsi tra tutte le coppie di waypoint (es. svr, fft, dac, out):
+    # l'ordine topologico è calcolato una sola volta e condiviso da tutte le passate
+    order = topological_order(circuit, [circuit.ids[name] for name in waypoints if name in circuit.ids])
+    counts = {}
+    for start in waypoints:
+        paths = count_paths_from(circuit, start, order)
+        for end in waypoints:
+            counts[(start, end)] = paths[circuit.ids[end]] if end in circuit.ids else 0
+    return counts
+
+
+# Numero di percorsi da start a end (stessa interfaccia della vecchia DFS ricorsiva).
+def dfs(circuit: DeviceGraph, start:str, end:str, cache:dict) -> int:
+    # La cache conserva, per ogni partenza, i percorsi verso tutti i nodi
+    if start not in cache:
+        cache[start] = count_paths_from(circuit, start)
+    node = circuit.ids.get(end)
+    return 0 if node is None else cache[start][node]
 
 
 def part_1(list_of_devices):
     # Crea il grafo del circuito
     circuit = create_graph(list_of_devices)
-    paths = 0
 
-    # BFS usando una coda (deque) partendo da "you"
-    frontier = deque(["you"])
-
-    while frontier:
-        node = frontier.popleft()  # Estrae il primo nodo dalla coda
-
-        # Se raggiungiamo "out", incrementa contatore
-        if node == "out":
-            paths += 1
-
-        # Aggiunge tutti i nodi figli alla coda
-        for next_node in circuit.get(node, set()):
-            frontier.append(next_node)
+    # Percorsi da "you" a "out" con la programmazione dinamica sull'ordine topologico
+    paths = dfs(circuit, "you", "out", {})
 
     print(f"Result part 1 -> {paths} paths")
 
 
 def part_2(list_of_devices):
     circuit = create_graph(list_of_devices)
-    cache = {}
-
-    # Calcola i percorsi da "svr" a "fft" e "dac"
-    path_from_server_to_fft = dfs(circuit, "svr", "fft", cache)
-    path_server_to_dac = dfs(circuit, "svr", "dac", cache)
-
-    # Sceglie il percorso più breve e calcola il totale moltiplicando i segmenti
-    if path_from_server_to_fft < path_server_to_dac:
-        # Percorso: svr → fft → dac → out
-        path_fft_to_dac = dfs(circuit, "fft", "dac", cache)
-        path_dac_to_out = dfs(circuit, "dac", "out", cache)
-        total = path_from_server_to_fft * path_fft_to_dac * path_dac_to_out
-    else:
-        # Percorso: svr → dac → fft → out
-        path_dac_to_fft = dfs(circuit, "dac", "fft", cache)
-        path_fft_to_out = dfs(circuit, "fft", "out", cache)
-        total = path_server_to_dac * path_dac_to_fft * path_fft_to_out
+
+    # Percorsi tra tutte le coppie di waypoint
+    paths = count_paths_between(circuit, ["svr", "fft", "dac", "out"])
+
+    # In un grafo aciclico al più uno dei due ordini di visita ha percorsi:
+    # svr → fft → dac → out oppure svr → dac → fft → out
+    total = (paths[("svr", "fft")] * paths[("fft", "dac")] * paths[("dac", "out")]
+             + paths[("svr", "dac")] * paths[("dac", "fft")] * paths[("fft", "out")])
 
     print(f"Result part 2 -> {total} paths")
 
@@ -82,4 +181,4 @@ def part_2(list_of_devices):
 if __name__ == "__main__":
     data = utils.read_input(11, map_fn, False)
     part_1(data)
-    part_2(data)
\ No newline at end of file
+    part_2(data)
@@ -1,3 +1,8 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
 import utils
 
 """
@@ -62,26 +67,203 @@ def generate_repeated_ids(max_digits: int = 12) -> set[int]:
     return invalid
 
 
+"""
+Motore aritmetico sugli intervalli: invece di generare i numeri ripetuti,
+li conta e li somma in forma chiusa.
+
+Un numero di total_len cifre ottenuto ripetendo k volte una sequenza di
+seq_len cifre (total_len = seq_len·k) vale seed · M, con
+M = (10^(seq_len·k) - 1) / (10^seq_len - 1), es.: 123123 = 123 · 1001.
+I seed validi formano un intervallo di interi, quindi quanti e la loro somma
+si ottengono con una serie aritmetica: il costo non dipende dall'ampiezza
+dell'intervallo [a, b].
+"""
+
+
+def prime_factors(n: int) -> list[int]:
+    """Restituisce i fattori primi distinti di n (es.: 12 -> [2, 3])."""
+    factors = []
+    p = 2
+    while p * p <= n:
+        if n % p == 0:
+            factors.append(p)
+            while n % p == 0:
+                n //= p
+        p += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def repeated_in_range(a: int, b: int, total_len: int, seq_len: int) -> tuple[int, int]:
+    """
+    Conta e somma i numeri di total_len cifre, compresi in [a, b], formati
+    ripetendo una sequenza di seq_len cifre (senza zeri iniziali).
+
+    Restituisce la tupla (quanti, somma).
+    """
+    multiplier = (10 ** total_len - 1) // (10 ** seq_len - 1)
+    # Seed senza zeri iniziali il cui valore ripetuto cade in [a, b]
+    low = max(10 ** (seq_len - 1), -(-a // multiplier))
+    high = min(10 ** seq_len - 1, b // multiplier)
+    if low > high:
+        return 0, 0
+    count = high - low + 1
+    return count, multiplier * (low + high) * count // 2
+
+
+def count_and_sum_repeated(a: int, b: int, halves_only: bool = False) -> tuple[int, int]:
+    """
+    Conta e somma gli ID invalidi in [a, b] senza enumerarli.
+
+    Con halves_only=True considera solo i numeri formati da due metà identiche
+    (regola di is_invalid_id, parte 1); altrimenti tutti quelli formati da una
+    sequenza ripetuta almeno 2 volte (parte 2).
+
+    Per la parte 2 un numero può avere più periodi (es.: 1111 = 11·2 = 1·4):
+    l'insieme dei ripetuti di lunghezza L è l'unione, sui primi r che dividono L,
+    di quelli con periodo L/r, e l'intersezione di due di questi insiemi è
+    quello con periodo L/(r1·r2). Si somma quindi per inclusione-esclusione
+    sui sottoinsiemi dei fattori primi di L.
+
+    Restituisce la tupla (quanti, somma).
+    """
+    count, total = 0, 0
+    for total_len in range(max(2, len(str(a))), len(str(b)) + 1):
+        # Parte di [a, b] con esattamente total_len cifre
+        low = max(a, 10 ** (total_len - 1))
+        high = min(b, 10 ** total_len - 1)
+        if low > high:
+            continue
+
+        if halves_only:
+            if total_len % 2 == 0:
+                c, t = repeated_in_range(low, high, total_len, total_len // 2)
+                count += c
+                total += t
+            continue
+
+        primes = prime_factors(total_len)
+        for mask in range(1, 1 << len(primes)):
+            product = 1
+            for bit, p in enumerate(primes):
+                if mask >> bit & 1:
+                    product *= p
+            sign = 1 if bin(mask).count("1") % 2 else -1
+            c, t = repeated_in_range(low, high, total_len, total_len // product)
+            count += sign * c
+            total += sign * t
+    return count, total
+
+
+def is_repeated_id(n: int) -> bool:
+    """
+    Controlla se `n` è formato da una sequenza ripetuta almeno 2 volte
+    (regola della parte 2, es.: 111, 1212, 123123123).
+    """
+    s = str(n)
+    # s è periodica se compare in (s+s) in una posizione diversa da 0 e len(s)
+    return (s + s).find(s, 1) < len(s)
+
+
+"""
+Valutazione in parallelo degli intervalli con un predicato qualsiasi.
+Gli intervalli vengono spezzati in blocchi di al più chunk_size numeri,
+distribuiti su un ProcessPoolExecutor e i risultati parziali (quanti, somma)
+vengono uniti nell'ordine dei blocchi, quindi in modo deterministico.
+"""
+
+
+def parse_intervals(line: str) -> list[tuple[int, int]]:
+    """Converte "10-50,100-200" nella lista [(10, 50), (100, 200)]."""
+    return [tuple(map(int, item.split("-"))) for item in line.split(",")]
+
+
+def split_intervals(intervals: list[tuple[int, int]], chunk_size: int) -> list[tuple[int, int]]:
+    """Spezza gli intervalli in sotto-intervalli di al più chunk_size numeri."""
+    chunks = []
+    for a, b in intervals:
+        for start in range(a, b + 1, chunk_size):
+            chunks.append((start, min(b, start + chunk_size - 1)))
+    return chunks
+
+
+def evaluate_interval(interval: tuple[int, int], predicate: Callable[[int], bool]) -> tuple[int, int]:
+    """Restituisce (quanti, somma) dei numeri di `interval` che soddisfano `predicate`."""
+    a, b = interval
+    matches = [n for n in range(a, b + 1) if predicate(n)]
+    return len(matches), sum(matches)
+
+
+def evaluate_intervals(
+    intervals: list[tuple[int, int]],
+    predicate: Callable[[int], bool] = is_invalid_id,
+    workers: int | None = None,
+    chunk_size: int = 100_000,
+) -> tuple[int, int]:
+    """
+    Valuta `predicate` su tutti i numeri degli intervalli usando più processi.
+
+    Il predicato deve essere una funzione di modulo (serializzabile con pickle),
+    es.: is_invalid_id o is_repeated_id. Con workers=1 lavora nel processo corrente.
+
+    Restituisce la tupla (quanti, somma) complessiva.
+    """
+    chunks = split_intervals(intervals, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [evaluate_interval(chunk, predicate) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map conserva l'ordine dei blocchi: l'unione dei parziali è deterministica
+            results = list(executor.map(evaluate_interval, chunks, [predicate] * len(chunks)))
+    return sum(c for c, _ in results), sum(t for _, t in results)
+
+
+def benchmark_evaluate_intervals(
+    intervals: list[tuple[int, int]],
+    predicate: Callable[[int], bool] = is_invalid_id,
+    max_workers: int | None = None,
+    chunk_size: int = 100_000,
+) -> dict[int, float]:
+    """
+    Misura il throughput (numeri/secondo) di evaluate_intervals al variare
+    del numero di processi, da 1 fino a max_workers (default: numero di core).
+    """
+    numbers = sum(b - a + 1 for a, b in intervals)
+    max_workers = max_workers or os.cpu_count() or 1
+    throughput = {}
+    workers = 1
+    while True:
+        began = time.perf_counter()
+        evaluate_intervals(intervals, predicate, workers, chunk_size)
+        throughput[workers] = numbers / (time.perf_counter() - began)
+        print(f"{workers:>3} processi: {throughput[workers]:,.0f} numeri/s")
+        if workers == max_workers:
+            return throughput
+        workers = min(workers * 2, max_workers)
+
+
 """
 PARTE 1:
 ids_input: lista con la prima riga dell'input (es.: "100-200,300-400")
-Per ogni intervallo genera gli ID e somma quelli che soddisfano is_invalid_id.
+Per ogni intervallo somma gli ID che soddisfano is_invalid_id, calcolati
+in forma chiusa da count_and_sum_repeated.
 """
 
 
 def part_1(ids_input) -> None:
     ids = [item.split('-') for item in ids_input[0].split(",")]
-    # Lista di ID considerati "invalidi" secondo is_invalid_id
-    invalid_ids = [id for item in ids for id in range(int(item[0]), int(item[1]) + 1) if is_invalid_id(id)]
-    somma_totale = sum(invalid_ids)
+    # Somma degli ID considerati "invalidi" secondo is_invalid_id
+    somma_totale = sum(count_and_sum_repeated(int(a), int(b), halves_only=True)[1] for a, b in ids)
     print("Somma id invalidi part_1:", somma_totale)
 
 
 """
 PARTE 2:
-Calcola la somma degli ID invalidi usando l'insieme generato da generate_repeated_ids.
-Questo approccio è più efficiente quando gli intervalli sono ampi perché si filtra
-solo l'insieme già noto di numeri ripetuti.
+Calcola la somma degli ID invalidi con count_and_sum_repeated: per ogni intervallo
+i numeri ripetuti vengono contati e sommati in forma chiusa, senza generare
+l'insieme di tutti i ripetuti né scorrere gli intervalli.
 """
 
 
@@ -101,45 +283,12 @@ def part_2(ids_input) -> None:
     intervals = [tuple(map(int, item.split("-"))) for item in ids_input[0].split(",")]
 
     """
-    Trovo il valore massimo tra le estremità degli intervalli
-    
-        - Estrae tutti i valori b dalle tuple (a, b)
-        - Calcola il massimo
-        
-    Es: da [(10,50),(100,200)] ottiene max_val = 200.
-    """
-    max_val = max(b for _, b in intervals)
-
-    """ 
-    Calcolo il numero di cifre del valore massimo 
-    
-    Se max_val = 200 → str(200) = "200" → len(...) = 3
- 🔎 Serve per generare numeri fino a quella lunghezza (1 cifra, 2 cifre, 3 cifre, ecc.)
-    """
-    max_digits = len(str(max_val))
-
-    """
-    Genero tutti i numeri ripetuti fino al numero di cifre massimo richiesto
-    Es. con n = 3 potrebbe generare 11, 22, 33, ..., 111, 222, 333, ...
+    Per ogni intervallo (a, b) calcolo la somma dei numeri ripetuti che vi cadono:
+    il costo dipende solo dal numero di cifre, non dall'ampiezza dell'intervallo.
     """
-    all_invalid = generate_repeated_ids(max_digits)
-
-    """
-    Seleziono solo quelli che ricadono negli intervalli forniti e tramite una list comprehension li metto in una lista.
-    Questa è una list comprehension doppia:
-    Per ogni intervallo (a, b) e per ogni numero id nella lista di numeri “ripetuti”, prendo solo gli id che sono compresi tra a <= id <= b.
-
-🔎  Risultato: una lista di invalid IDs che cadono nei range.
-    """
-    res = [id for a, b in intervals for id in all_invalid if a <= id <= b]
-
-    """
-    Calcolo la somma totale degli ID invalidi trovati e la stampo.
-    """
-    somma_totale = sum(res)
+    somma_totale = sum(count_and_sum_repeated(a, b)[1] for a, b in intervals)
     print("Somma id invalidi part_2:", somma_totale)
 
-
 if __name__ == "__main__":
     input = utils.read_input(2, str, False)
     part_1(input)
@@ -1,5 +1,9 @@
+import numpy as np
 import utils
 
+# Cifre elaborate insieme da best_subsequences_batch (circa 40 byte di tabella ciascuna)
+BATCH_CELL_LIMIT = 1 << 20
+
 def map_fn(line):
     return line
 
@@ -9,62 +13,148 @@ def max_shock(line:list[int]) -> int:
     Per ogni posizione i prende la cifra in posizione i come decina
     e la cifra massima alla sua destra come unità, formando first*10+second.
     Restituisce il massimo di questi valori.
+    Scorre la riga da destra mantenendo il massimo del suffisso: O(n).
     """
     best = 0
-    # scorri tutte le posizioni per la prima cifra (decina)
-    for i in range(len(line) - 1):
+    if len(line) < 2:
+        return best
+    # massimo delle cifre alla destra della posizione corrente
+    suffix_max = int(line[-1])
+    # scorri le posizioni per la prima cifra (decina) da destra a sinistra
+    for i in range(len(line) - 2, -1, -1):
         first = int(line[i])
-        # trova il valore massimo alla destra di i
-        second = max(int(c) for c in line[i + 1:])
-        # forma il numero
-        shock = first * 10 + second
+        # forma il numero con la cifra massima alla sua destra
+        shock = first * 10 + suffix_max
         # aggiorna se è migliore
         if shock > best:
             best = shock
+        if first > suffix_max:
+            suffix_max = first
     return best
 
 def best_subsequence_of_length(line:str, number_to_take:int) -> str:
     """
     Restituisce la sotto sequenza lessicograficamente massima
     di lunghezza number_to_take mantenendo l'ordine originale.
-    Algoritmo greedy: per ogni posizione scelta prende la cifra massima
-    possibile nella finestra rimanente che consente di completare la
-    sotto sequenza della lunghezza richiesta.
+    Stack monotono in un solo passaggio: ogni cifra toglie dalla cima dello
+    stack le cifre più piccole finché restano cifre da scartare
+    (line_length - number_to_take in tutto). O(n) per qualsiasi lunghezza.
+    """
+    to_drop = len(line) - number_to_take
+    stack = []
+
+    for digit in line:
+        # Una cifra più grande rende inutili le cifre più piccole che la precedono
+        while to_drop and stack and stack[-1] < digit:
+            stack.pop()
+            to_drop -= 1
+        stack.append(digit)
+
+    return "".join(stack[:number_to_take])
+
+def load_bank_matrix(lines:list[str]) -> np.ndarray:
+    """
+    Converte le righe di un file di banche in una matrice uint8 di cifre,
+    una riga per banca. Le righe devono avere tutte la stessa lunghezza.
+    """
+    lengths = {len(line) for line in lines}
+    if len(lengths) > 1:
+        raise ValueError(f"Le righe devono avere la stessa lunghezza, trovate {sorted(lengths)}")
+    buffer = "".join(lines).encode()
+    return (np.frombuffer(buffer, dtype=np.uint8) - ord("0")).reshape(len(lines), -1)
+
+def best_subsequences_block(matrix:np.ndarray, number_to_take:int) -> np.ndarray:
+    """
+    Calcola per ogni riga della matrice la sotto sequenza massima di lunghezza
+    number_to_take, elaborando tutte le righe insieme.
+
+    Per ogni cifra d si precalcola next_pos[d][r, p], la prima posizione >= p
+    della cifra d nella riga r. La scelta greedy di ogni cifra diventa allora
+    una prova delle cifre dalla 9 alla 0 su tutte le righe: O(10·k) operazioni
+    vettoriali invece di un ciclo Python per cifra e per riga.
+    La tabella occupa 40 byte per cifra in ingresso: vedi best_subsequences_batch.
+
+    Restituisce una matrice uint8 (righe, number_to_take) con le cifre scelte.
     """
-    take = number_to_take
-    line_length = len(line)
-    result = []
+    rows, line_length = matrix.shape
+    positions = np.arange(line_length + 1, dtype=np.int32)
+    next_pos = np.empty((10, rows, line_length + 1), dtype=np.int32)
+    for digit in range(10):
+        # Posizione della cifra dove compare, line_length altrove; minimo cumulato da destra
+        found = np.where(matrix == digit, positions[:-1], line_length).astype(np.int32)
+        found = np.concatenate((found, np.full((rows, 1), line_length, dtype=np.int32)), axis=1)
+        next_pos[digit] = np.minimum.accumulate(found[:, ::-1], axis=1)[:, ::-1]
 
-    start = 0
-    while take > 0:
-        # Finestra in cui è possibile scegliere la prossima cifra
-        end = line_length - take
+    all_rows = np.arange(rows)
+    start = np.zeros(rows, dtype=np.int32)
+    result = np.zeros((rows, number_to_take), dtype=np.uint8)
+    for taken in range(number_to_take):
+        # Ultima posizione utilizzabile lasciando spazio alle cifre mancanti
+        end = line_length - number_to_take + taken
+        chosen = np.zeros(rows, dtype=bool)
+        for digit in range(9, -1, -1):
+            pos = next_pos[digit][all_rows, start]
+            take = ~chosen & (pos <= end)
+            result[take, taken] = digit
+            start = np.where(take, pos + 1, start)
+            chosen |= take
+    return result
 
-        # Trova la cifra più grande nella finestra line[start:end+1]
-        best_digit = max(line[start:end+1])
-        pos = line.index(best_digit, start, end + 1)
+def best_subsequences_batch(matrix:np.ndarray, number_to_take:int, max_cells:int=BATCH_CELL_LIMIT) -> np.ndarray:
+    """
+    Come best_subsequences_block, ma con memoria limitata: le righe vengono
+    elaborate a blocchi di al più max_cells cifre, così next_pos non supera
+    circa 40·max_cells byte qualunque sia la dimensione del file.
+    Se anche una sola riga supera max_cells si usa lo stack monotono
+    (best_subsequence_of_length) riga per riga, che richiede O(n) memoria.
+
+    Restituisce una matrice uint8 (righe, number_to_take) con le cifre scelte.
+    """
+    rows, line_length = matrix.shape
+    result = np.zeros((rows, number_to_take), dtype=np.uint8)
+    if line_length + 1 > max_cells:
+        for r in range(rows):
+            line = (matrix[r] + ord("0")).tobytes().decode()
+            result[r] = np.frombuffer(best_subsequence_of_length(line, number_to_take).encode(), dtype=np.uint8) - ord("0")
+        return result
+    block = max_cells // (line_length + 1)
+    for first in range(0, rows, block):
+        result[first:first + block] = best_subsequences_block(matrix[first:first + block], number_to_take)
+    return result
 
-        result.append(best_digit)
-        take -= 1
-        start = pos + 1
+def uniform_length(lines:list[str], number_to_take:int) -> bool:
+    """True se le righe hanno tutte la stessa lunghezza, almeno number_to_take: il calcolo in blocco è possibile."""
+    lengths = {len(line) for line in lines}
+    return len(lengths) == 1 and lengths.pop() >= number_to_take
 
-    return "".join(result)
+def digits_to_int(digits) -> int:
+    """Converte una sequenza di cifre in un intero Python (senza limiti di precisione)."""
+    return int("".join(map(str, digits)))
 
 def part_1(data:list[str]) -> None:
     """
     Converte ogni token numerico in una lista di cifre (int) e somma
     i valori max_shock per ogni riga, stampando il totale.
+    Se le righe hanno la stessa lunghezza usa il calcolo in blocco.
     """
-    lista = [list(map(int, num)) for item in data for num in item.split()]
-    total_shock = sum(max_shock(line) for line in lista)
+    lista = [num for item in data for num in item.split()]
+    if uniform_length(lista, 2):
+        best = best_subsequences_batch(load_bank_matrix(lista), 2)
+        total_shock = int(best[:, 0].astype(np.int64).sum() * 10 + best[:, 1].astype(np.int64).sum())
+    else:
+        total_shock = sum(max_shock(list(map(int, line))) for line in lista)
     print("Shock totali:", total_shock)
 
 def part_2(data:list[str]) -> None:
     """
     Per ogni riga interpreta la linea come una stringa di cifre e prende
     la sotto sequenza massima di lunghezza 12, la converte in intero e somma.
+    Se le righe hanno la stessa lunghezza usa il calcolo in blocco.
     """
-    total_big_shock = sum(int(best_subsequence_of_length(line, 12)) for line in data)
+    if uniform_length(data, 12):
+        total_big_shock = sum(digits_to_int(row) for row in best_subsequences_batch(load_bank_matrix(data), 12))
+    else:
+        total_big_shock = sum(int(best_subsequence_of_length(line, 12)) for line in data)
     print("Big shock totali:", total_big_shock)
 
 if __name__ == "__main__":
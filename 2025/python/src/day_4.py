@@ -1,3 +1,4 @@
+import numpy as np
 import utils
 
 def map_fn(input_file):
@@ -30,33 +31,203 @@ def find_accessible_rolls(grid):
 
     return accessible
 
+def erode_rolls(grid):
+    """
+    Rimuove i rotoli accessibili a ondate e restituisce quanti ne toglie ogni ondata.
+
+    I conteggi dei vicini vengono calcolati una sola volta su una griglia
+    piatta con bordo; togliendo un rotolo si decrementano solo i suoi 8 vicini
+    e quelli che scendono sotto 4 entrano nell'ondata successiva. Il lavoro
+    totale è O(celle) invece di una scansione completa per ogni ondata.
+    """
+    rows = len(grid)
+    cols = len(grid[0]) if rows else 0
+    # Griglia piatta con una cornice vuota: niente controlli sui bordi
+    width = cols + 2
+    present = bytearray(width * (rows + 2))
+    for row in range(rows):
+        base = (row + 1) * width + 1
+        for col in range(cols):
+            if grid[row][col] == '@':
+                present[base + col] = 1
+    offsets = (-width - 1, -width, -width + 1, -1, 1, width - 1, width, width + 1)
+
+    counts = bytearray(len(present))
+    cells = [i for i, cell in enumerate(present) if cell]
+    for i in cells:
+        counts[i] = sum(present[i + offset] for offset in offsets)
+
+    # queued evita di inserire due volte lo stesso rotolo in un'ondata
+    wave = [i for i in cells if counts[i] < 4]
+    queued = bytearray(len(present))
+    for i in wave:
+        queued[i] = 1
+
+    waves = []
+    while wave:
+        for i in wave:
+            present[i] = 0
+            row, col = divmod(i, width)
+            grid[row - 1][col - 1] = '.'
+        next_wave = []
+        for i in wave:
+            for offset in offsets:
+                j = i + offset
+                if present[j]:
+                    counts[j] -= 1
+                    if counts[j] < 4 and not queued[j]:
+                        queued[j] = 1
+                        next_wave.append(j)
+        waves.append(len(wave))
+        wave = next_wave
+
+    return waves
+
+
 def remove_accessible_rolls(grid):
     """Rimuove iterativamente i rotoli accessibili"""
-    total_removed = 0
-
+    return sum(erode_rolls(grid))
+
+def load_grid_array(grid):
+    """Converte la griglia in un array booleano: True dove c'è un rotolo (forma (0, 0) se vuota)"""
+    buffer = "".join("".join(row) for row in grid).encode()
+    width = len(grid[0]) if len(grid) else 0
+    return (np.frombuffer(buffer, dtype=np.uint8) == ord('@')).reshape(len(grid), width)
+
+
+def neighbour_counts(rolls):
+    """Conta i rotoli negli 8 vicini di ogni cella sommando la griglia traslata"""
+    padded = np.pad(rolls, 1).astype(np.uint8)
+    rows, cols = rolls.shape
+    counts = np.zeros((rows, cols), dtype=np.uint8)
+    for dr in range(3):
+        for dc in range(3):
+            if dr != 1 or dc != 1:
+                counts += padded[dr:dr + rows, dc:dc + cols]
+    return counts
+
+
+def find_accessible_rolls_numpy(grid):
+    """Come find_accessible_rolls, ma calcola tutti i conteggi con NumPy in un'unica passata"""
+    rolls = load_grid_array(grid)
+    accessible = rolls & (neighbour_counts(rolls) < 4)
+    return [tuple(cell) for cell in np.argwhere(accessible).tolist()]
+
+
+def erode_rolls_numpy(grid):
+    """
+    Come erode_rolls, ma ogni ondata è una maschera di array: i rotoli
+    accessibili vengono tolti tutti insieme e i conteggi ricalcolati in blocco.
+    """
+    rolls = load_grid_array(grid)
+    waves = []
     while True:
-        # Trova i rotoli accessibili
-        accessible = find_accessible_rolls(grid)
-
-        # Se non ci sono rotoli da rimuovere, fermati
-        if not accessible:
+        accessible = rolls & (neighbour_counts(rolls) < 4)
+        removed = int(np.count_nonzero(accessible))
+        if not removed:
+            break
+        rolls &= ~accessible
+        waves.append(removed)
+
+    # Riporta nella griglia originale i rotoli rimossi
+    for row, col in np.argwhere(load_grid_array(grid) & ~rolls).tolist():
+        grid[row][col] = '.'
+    return waves
+
+
+def remove_accessible_rolls_numpy(grid):
+    """Come remove_accessible_rolls, con il backend NumPy"""
+    return sum(erode_rolls_numpy(grid))
+
+
+def load_grid_bits(grid):
+    """Converte ogni riga in un intero Python: il bit col è 1 se in quella colonna c'è un rotolo"""
+    return [int("".join('1' if cell == '@' else '0' for cell in reversed(row)) or '0', 2) for row in grid]
+
+
+def accessible_bits(rows, width):
+    """
+    Per ogni riga restituisce la maschera dei rotoli con meno di 4 vicini.
+
+    Gli 8 vicini sono le righe sopra, corrente e sotto traslate di un bit;
+    vengono sommati con un contatore a 4 bit "per colonna" (sommatori in
+    cascata fatti con AND/XOR), così ogni operazione lavora su tutta la riga.
+    Il conteggio è < 4 quando i bit di peso 4 e 8 sono entrambi zero.
+    """
+    mask = (1 << width) - 1
+    result = []
+    for index, current in enumerate(rows):
+        above = rows[index - 1] if index > 0 else 0
+        below = rows[index + 1] if index + 1 < len(rows) else 0
+        # Bit di peso 1, 2, 4 e 8 del conteggio dei vicini di ogni colonna
+        ones = twos = fours = eights = 0
+        for plane in (above << 1, above, above >> 1, current << 1, current >> 1, below << 1, below, below >> 1):
+            plane &= mask
+            carry = ones & plane
+            ones ^= plane
+            carry, twos = twos & carry, twos ^ carry
+            carry, fours = fours & carry, fours ^ carry
+            eights |= carry
+        result.append(current & ~(fours | eights))
+    return result
+
+
+def set_bits(value):
+    """Restituisce le posizioni dei bit a 1 di value, in ordine crescente"""
+    positions = []
+    while value:
+        low = value & -value
+        positions.append(low.bit_length() - 1)
+        value ^= low
+    return positions
+
+
+def find_accessible_rolls_bits(grid):
+    """Come find_accessible_rolls, con le righe rappresentate come interi a bit"""
+    width = len(grid[0]) if grid else 0
+    accessible = accessible_bits(load_grid_bits(grid), width)
+    return [(row, col) for row, bits in enumerate(accessible) for col in set_bits(bits)]
+
+
+def erode_rolls_bits(grid):
+    """Come erode_rolls, ma ogni ondata toglie i rotoli accessibili con operazioni su intere righe"""
+    width = len(grid[0]) if grid else 0
+    rows = load_grid_bits(grid)
+    waves = []
+    while True:
+        accessible = accessible_bits(rows, width)
+        removed = sum(bits.bit_count() for bits in accessible)
+        if not removed:
             break
+        for row, bits in enumerate(accessible):
+            if bits:
+                rows[row] &= ~bits
+                for col in set_bits(bits):
+                    grid[row][col] = '.'
+        waves.append(removed)
+    return waves
+
 
-        # Rimuovi i rotoli accessibili
-        for row, col in accessible:
-            grid[row][col] = '.'
+def remove_accessible_rolls_bits(grid):
+    """Come remove_accessible_rolls, con le righe rappresentate come interi a bit"""
+    return sum(erode_rolls_bits(grid))
 
-        total_removed += len(accessible)
 
-    return total_removed
+BACKENDS = {
+    "python": (find_accessible_rolls, remove_accessible_rolls),
+    "numpy": (find_accessible_rolls_numpy, remove_accessible_rolls_numpy),
+    "bits": (find_accessible_rolls_bits, remove_accessible_rolls_bits),
+}
 
-def part_1(data:list[list[str]]) -> None:
+def part_1(data:list[list[str]], backend:str = "python") -> None:
     # Parte 1
-    accessible = find_accessible_rolls(data)
+    find, _ = BACKENDS[backend]
+    accessible = find(data)
     print(f"Parte 1: {len(accessible)}")
 
-def part_2(data:list[list[str]]) -> None:
-    total = remove_accessible_rolls(data)
+def part_2(data:list[list[str]], backend:str = "python") -> None:
+    _, remove = BACKENDS[backend]
+    total = remove(data)
     print(f"Parte 2: {total}")
 
 if __name__ == "__main__":
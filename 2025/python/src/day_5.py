@@ -1,5 +1,9 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import utils
-from bisect import bisect_right
 
 def map_ingredient_ids(lines) -> list[tuple[int,int]]:
     return [(int(before), int(after)) for line in lines.split("\n") for before, after in [line.split("-")]]
@@ -27,46 +31,149 @@ def merge_ranges(ranges):
     return [(s, e) for s, e in merged]
 
 
-def count_fresh_ids(ranges, ids):
-    """Conta quanti ID sono freschi."""
-    merged = merge_ranges(ranges)
-    starts = [s for s, _ in merged]
-    count = 0
+class RangeIndex:
+    """
+    Indice delle gamme di ID freschi, costruito una sola volta e riutilizzabile.
 
-    for id_val in ids:
-        # Trova la gamma che potrebbe contenere questo ID
-        idx = bisect_right(starts, id_val)
-        if idx > 0:
-            start, end = merged[idx - 1]
-            if start <= id_val <= end:
-                count += 1
+    Le gamme unite sono memorizzate in due array ordinati (inizi e fine
+    inclusive), così le verifiche di appartenenza di interi lotti di ID
+    si fanno con un solo numpy.searchsorted.
+    """
 
-    return count
+    def __init__(self, ranges=()):
+        merged = merge_ranges(ranges)
+        self.starts = np.array([s for s, _ in merged], dtype=np.int64)
+        self.ends = np.array([e for _, e in merged], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def contains(self, ids):
+        """Restituisce un array booleano: True per ogni ID che cade in una gamma."""
+        ids = np.asarray(ids, dtype=np.int64)
+        # Indice della gamma con l'inizio più grande <= id
+        idx = np.searchsorted(self.starts, ids, side="right") - 1
+        inside = idx >= 0
+        inside[inside] = ids[inside] <= self.ends[idx[inside]]
+        return inside
+
+    def count_fresh(self, ids):
+        """Conta quanti ID del lotto sono freschi."""
+        return int(np.count_nonzero(self.contains(ids)))
+
+    def total(self):
+        """Numero totale di ID coperti dalle gamme (i range sono inclusivi)."""
+        return int((self.ends - self.starts + 1).sum())
+
+    def insert(self, start, end):
+        """
+        Aggiunge la gamma [start, end] unendola a quelle sovrapposte o adiacenti,
+        senza ricostruire l'indice.
+        """
+        # Prima gamma che finisce almeno in start - 1 e prima che inizia dopo end + 1
+        lo = int(np.searchsorted(self.ends, start - 1, side="left"))
+        hi = int(np.searchsorted(self.starts, end + 1, side="right"))
+        if lo < hi:
+            start = min(start, int(self.starts[lo]))
+            end = max(end, int(self.ends[hi - 1]))
+        self.starts = np.concatenate((self.starts[:lo], [start], self.starts[hi:]))
+        self.ends = np.concatenate((self.ends[:lo], [end], self.ends[hi:]))
+
+
+def count_fresh_ids(ranges, ids):
+    """Conta quanti ID sono freschi."""
+    index = ranges if isinstance(ranges, RangeIndex) else RangeIndex(ranges)
+    return index.count_fresh(ids)
 
 
 def count_total_fresh_ids(ranges):
     """
     Conta il numero totale di ID freschi nei range uniti.
     """
-    merged = merge_ranges(ranges)
-    total = 0
+    index = ranges if isinstance(ranges, RangeIndex) else RangeIndex(ranges)
+    return index.total()
 
-    for start, end in merged:
-        total += end - start + 1  # +1 perché i range sono inclusivi
+def id_section_offset(path):
+    """Restituisce la posizione in byte in cui inizia la sezione degli ID (dopo la riga vuota)."""
+    with open(path, "rb") as input_file:
+        for line in iter(input_file.readline, b""):
+            if not line.strip():
+                return input_file.tell()
+    return os.path.getsize(path)
 
+
+def chunk_boundaries(path, offset, chunk_size):
+    """
+    Divide la sezione degli ID in blocchi disgiunti di circa chunk_size byte.
+    Ogni confine viene spostato all'inizio della riga successiva, così nessun ID
+    viene spezzato tra due blocchi.
+    """
+    size = os.path.getsize(path)
+    boundaries = [offset]
+    with open(path, "rb") as input_file:
+        while boundaries[-1] < size:
+            input_file.seek(min(boundaries[-1] + chunk_size, size))
+            input_file.readline()
+            boundaries.append(min(input_file.tell(), size))
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_id_chunk(path, start, end):
+    """Legge i byte [start, end) del file e li converte in un array int64 di ID."""
+    with open(path, "rb") as input_file:
+        input_file.seek(start)
+        data = input_file.read(end - start)
+    return np.fromstring(data, dtype=np.int64, sep=" ")
+
+
+def count_chunk(index, path, start, end):
+    """Conta gli ID freschi di un blocco; restituisce (ID letti, ID freschi, secondi)."""
+    began = time.perf_counter()
+    ids = read_id_chunk(path, start, end)
+    fresh = index.count_fresh(ids)
+    return len(ids), fresh, time.perf_counter() - began
+
+
+def count_fresh_ids_streaming(index, path, chunk_size=1 << 24, workers=1, report=False):
+    """
+    Conta gli ID freschi leggendo la sezione degli ID a blocchi di chunk_size byte.
+
+    La memoria massima dipende dalla dimensione del blocco (per processo) e non
+    dalla dimensione del file. Con workers > 1 i blocchi vengono distribuiti su
+    più processi. Se report è True stampa il throughput di ogni blocco.
+    """
+    chunks = chunk_boundaries(path, id_section_offset(path), chunk_size)
+    starts = [start for start, _ in chunks]
+    ends = [end for _, end in chunks]
+    jobs = ([index] * len(chunks), [path] * len(chunks), starts, ends)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(count_chunk, *jobs))
+    else:
+        results = list(map(count_chunk, *jobs))
+
+    total = 0
+    for number, (read, fresh, seconds) in enumerate(results):
+        total += fresh
+        if report:
+            throughput = read / seconds if seconds else float("inf")
+            print(f"Blocco {number}: {read} ID, {fresh} freschi, {throughput:,.0f} ID/s")
     return total
 
-def part_1(ingredient_ids:list[tuple[int,int]], fresh_ingredient:list[int]) -> None:
+
+def part_1(ingredient_ids:list[tuple[int,int]] | RangeIndex, fresh_ingredient:list[int]) -> None:
     # Parte 1
     result = count_fresh_ids(ingredient_ids, fresh_ingredient)
     print(f"Numero di ID freschi: {result}")
 
 
-def part_2(ingredient_ids:list[tuple[int, int]]) -> None:
+def part_2(ingredient_ids:list[tuple[int, int]] | RangeIndex) -> None:
     result = count_total_fresh_ids(ingredient_ids)
     print(f"Numero di ID freschi: {result}")
 
 if __name__ == "__main__":
     list_ingredient_ids, list_fresh_ingredient = utils.read_multisection_input(5, [map_ingredient_ids, map_fresh_ingredient], False)
-    part_1(list_ingredient_ids, list_fresh_ingredient)
-    part_2(list_ingredient_ids)
+    # L'indice delle gamme viene costruito una sola volta e usato da entrambe le parti
+    fresh_index = RangeIndex(list_ingredient_ids)
+    part_1(fresh_index, list_fresh_ingredient)
+    part_2(fresh_index)
@@ -1,138 +1,162 @@
-import utils
+import time
 
-def count_beam_splits(grid):
-    """Conta quante volte un raggio viene diviso da splitter ('^') nella griglia."""
-    # Ottiene le dimensioni della griglia
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
+import numpy as np
+import utils
 
+def splitter_mask(line: str, width: int):
+    """Restituisce un array booleano lungo width: True dove la riga ha uno splitter ('^')."""
+    row = line.encode()[:width].ljust(width, b'.')
+    return np.frombuffer(row, dtype=np.uint8) == ord('^')
+
+
+# Modalità di conteggio delle timeline
+EXACT = "exact"        # interi Python in un array object: esatto ma lento
+MODULAR = "modular"    # int64 modulo un primo: veloce, risultato ridotto modulo il primo
+LIMBS = "limbs"        # int64 a più "cifre" in base 2^LIMB_BITS: veloce ed esatto
+
+# Primo di default per la modalità modulare (2^61 - 1): 3 · p sta ancora in un int64
+DEFAULT_MODULUS = (1 << 61) - 1
+# Ogni limb tiene 60 bit: la somma di 3 limb più il riporto non supera 2^63
+LIMB_BITS = 60
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+def active_columns(counts):
+    """Colonne con almeno una timeline (counts ha forma (width,) o (limb, width))."""
+    active = counts != 0
+    return active if counts.ndim == 1 else active.any(axis=0)
+
+
+def normalize_limbs(limbs):
+    """
+    Propaga i riporti tra i limb di ogni colonna, aggiungendo un limb quando
+    il più alto trabocca. Le colonne piccole restano con i limb alti a zero:
+    solo i valori che superano 60 bit usano davvero le righe aggiuntive.
+    """
+    index = 0
+    while index < len(limbs):
+        carry = limbs[index] >> LIMB_BITS
+        if carry.any():
+            limbs[index] &= LIMB_MASK
+            if index + 1 == len(limbs):
+                limbs = np.vstack((limbs, np.zeros_like(limbs[:1])))
+            limbs[index + 1] += carry
+        index += 1
+    return limbs
+
+
+def limbs_to_int(limbs):
+    """Somma esatta di tutte le colonne di un fronte a limb, come intero Python."""
+    return sum(int(limb.astype(object).sum()) << (LIMB_BITS * index) for index, limb in enumerate(limbs))
+
+
+def sweep_dense(counts, mask):
+    """
+    Applica gli splitter di una riga a un fronte denso (un contatore per colonna).
+
+    Le timeline che colpiscono uno splitter passano alle colonne vicine
+    tramite due traslazioni dell'array; quelle che escono dalla griglia si perdono.
+    Le traslazioni agiscono sull'ultimo asse, quindi counts può avere forma
+    (width,) oppure (limb, width).
+    Restituisce (nuovo fronte, numero di split della riga).
+    """
+    hit = mask & active_columns(counts)
+    split_counts = np.where(hit, counts, 0)
+    next_counts = np.where(hit, 0, counts)
+    # Una va a sinistra (colonna c - 1) e una a destra (colonna c + 1)
+    next_counts[..., :-1] += split_counts[..., 1:]
+    next_counts[..., 1:] += split_counts[..., :-1]
+    return next_counts, int(np.count_nonzero(hit))
+
+
+def sweep_sparse(cols, counts, mask):
+    """
+    Come sweep_dense, ma il fronte è la lista ordinata delle sole colonne attive
+    con i relativi contatori: la memoria dipende dai raggi, non dalla larghezza.
+    Restituisce (nuove colonne, nuovi contatori, numero di split della riga).
+    """
+    hit = mask[cols]
+    split_cols, split_counts = cols[hit], counts[..., hit]
+    next_cols = np.concatenate((cols[~hit], split_cols - 1, split_cols + 1))
+    next_counts = np.concatenate((counts[..., ~hit], split_counts, split_counts), axis=-1)
+    inside = (next_cols >= 0) & (next_cols < len(mask))
+    # Le timeline che arrivano nella stessa colonna si sommano
+    cols, inverse = np.unique(next_cols[inside], return_inverse=True)
+    merged = np.zeros(counts.shape[:-1] + (len(cols),), dtype=counts.dtype)
+    np.add.at(merged, (..., inverse), next_counts[..., inside])
+    return cols, merged, int(np.count_nonzero(hit))
+
+
+def sweep_manifold(rows, sparse=False, mode=LIMBS, modulus=DEFAULT_MODULUS):
+    """
+    Simula il manifold riga per riga e restituisce (split del raggio, timeline totali).
+
+    Il fronte della riga corrente contiene, per ogni colonna, quante timeline
+    la attraversano: il raggio classico è l'insieme delle colonne con
+    contatore > 0, quindi entrambe le risposte escono da un solo passaggio
+    con memoria O(larghezza). Con sparse=True il fronte è la lista ordinata
+    delle colonne attive, adatta a manifold molto larghi e poco popolati.
+
+    Le timeline crescono in modo esponenziale, mode sceglie come contarle:
+    EXACT usa interi Python (dtype object), MODULAR conta in int64 modulo
+    `modulus` (primo < 2^61), LIMBS conta in int64 a più limb, esatto e
+    vettoriale, aggiungendo limb solo quando qualche colonna trabocca.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
     # Cerca la posizione iniziale 'S' nella prima riga
-    start_col = -1
-    for col in range(cols):
-        if grid[0][col] == 'S':
-            start_col = col
-            break
-
-    # Se non trova 'S', restituisce 0
+    start_col = first.find('S') if first is not None else -1
     if start_col == -1:
-        return 0
+        return 0, 0
+    if mode not in (EXACT, MODULAR, LIMBS):
+        raise ValueError(f"Modalità di conteggio sconosciuta: {mode}")
+
+    width = len(first.rstrip('\n'))
+    dtype = object if mode == EXACT else np.int64
+    # Con LIMBS il fronte ha forma (limb, colonne), inizialmente con un solo limb
+    shape = (1,) if mode == LIMBS else ()
+    if sparse:
+        cols = np.array([start_col], dtype=np.int64)
+        counts = np.ones(shape + (1,), dtype=dtype)
+    else:
+        counts = np.zeros(shape + (width,), dtype=dtype)
+        counts[..., start_col] = 1
 
-    # Lista dei raggi attualmente attivi, rappresentati come tuple (riga, colonna)
-    active_beams = [(0, start_col)]
-    # Set per tracciare le posizioni già visitate ed evitare duplicati
-    visited = set()
-    # Contatore del numero di split
     split_count = 0
+    for line in rows:
+        mask = splitter_mask(line, width)
+        if sparse:
+            cols, counts, splits = sweep_sparse(cols, counts, mask)
+        else:
+            counts, splits = sweep_dense(counts, mask)
+        if mode == MODULAR:
+            counts %= modulus
+        elif mode == LIMBS:
+            counts = normalize_limbs(counts)
+        split_count += splits
+
+    # Le timeline ancora attive nell'ultima riga escono dal manifold
+    if mode == LIMBS:
+        return split_count, limbs_to_int(counts)
+    if mode == MODULAR:
+        return split_count, int(counts.astype(object).sum()) % modulus
+    return split_count, int(counts.sum())
 
-    # Continua finché ci sono raggi attivi
-    while active_beams:
-        new_beams = []
-
-        # Processa ogni raggio attivo
-        for row, col in active_beams:
-            # Muove il raggio verso il basso di una riga
-            row += 1
-
-            # Se il raggio esce dal manifold (oltre l'ultima riga), lo ignora
-            if row >= rows:
-                continue
-
-            # Controlla cosa c'è nella posizione corrente
-            if grid[row][col] == '^':
-                # Trovato uno splitter: incrementa il contatore
-                split_count += 1
-
-                # Crea due nuovi raggi: uno a sinistra e uno a destra
-                if col > 0:
-                    beam_left = (row, col - 1)
-                    if beam_left not in visited:
-                        new_beams.append(beam_left)
-                        visited.add(beam_left)
-
-                if col < cols - 1:
-                    beam_right = (row, col + 1)
-                    if beam_right not in visited:
-                        new_beams.append(beam_right)
-                        visited.add(beam_right)
-            else:
-                # Spazio vuoto: il raggio continua dritto
-                beam = (row, col)
-                if beam not in visited:
-                    new_beams.append(beam)
-                    visited.add(beam)
-
-        # Aggiorna i raggi attivi per la prossima iterazione
-        active_beams = new_beams
-
-    return split_count
 
-def count_quantum_timelines(grid):
-    """Conta il numero totale di timeline quantistiche che raggiungono l'uscita."""
-    # Ottiene le dimensioni della griglia
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
+def count_beam_splits(grid):
+    """Conta quante volte un raggio viene diviso da splitter ('^') nella griglia."""
+    return sweep_manifold(grid)[0]
 
-    # Cerca la posizione iniziale 'S' nella prima riga
-    start_col = -1
-    for col in range(cols):
-        if grid[0][col] == 'S':
-            start_col = col
-            break
 
-    if start_col == -1:
-        return 0
-
-    # Dizionario che mappa ogni posizione al numero di timeline che la attraversano
-    # Inizialmente: 1 timeline parte dalla posizione 'S'
-    current_states = {(0, start_col): 1}
-
-    # Processa ogni riga della griglia
-    for row in range(rows):
-        next_states = {}
-
-        # Per ogni posizione con le sue timeline
-        for (r, c), count in current_states.items():
-            # Considera solo le posizioni nella riga corrente
-            if r != row:
-                continue
-
-            # Calcola la prossima riga
-            next_row = row + 1
-
-            # Se la prossima riga esce dal manifold
-            if next_row >= rows:
-                # Conta queste timeline come uscite
-                if 'exit' not in next_states:
-                    next_states['exit'] = 0
-                next_states['exit'] += count
-                continue
-
-            # Controlla il contenuto della cella successiva
-            if grid[next_row][c] == '^':
-                # Splitter: ogni timeline si divide in due
-                # Una va a sinistra
-                if c > 0:
-                    key = (next_row, c - 1)
-                    next_states[key] = next_states.get(key, 0) + count
-
-                # Una va a destra
-                if c < cols - 1:
-                    key = (next_row, c + 1)
-                    next_states[key] = next_states.get(key, 0) + count
-            else:
-                # Spazio vuoto: le timeline continuano nella stessa colonna
-                key = (next_row, c)
-                next_states[key] = next_states.get(key, 0) + count
-
-        # Aggiorna gli stati per la prossima iterazione
-        current_states = next_states
-
-    # Restituisce il numero totale di timeline che hanno raggiunto l'uscita
-    return current_states.get('exit', 0)
+def count_quantum_timelines(grid):
+    """Conta il numero totale di timeline quantistiche che raggiungono l'uscita."""
+    return sweep_manifold(grid)[1]
 
-def create_grid(lines: list[str]):
-    """Estrae la griglia dall'input, iniziando dalla riga che contiene 'S'."""
-    grid = []
+def iter_grid(lines):
+    """
+    Come create_grid, ma restituisce le righe della griglia una alla volta:
+    accetta qualsiasi iterabile di righe, compreso un file aperto.
+    """
     reading_grid = False
     for line in lines:
         # Rimuove il newline finale
@@ -140,10 +164,38 @@ def create_grid(lines: list[str]):
         # Inizia a leggere quando trova 'S' o se ha già iniziato
         if 'S' in line or reading_grid:
             reading_grid = True
-            # Aggiunge la riga se non è vuota e non è un separatore
+            # Restituisce la riga se non è vuota e non è un separatore
             if line and not line.startswith('---'):
-                grid.append(line)
-    return grid
+                yield line
+
+def create_grid(lines: list[str]):
+    """Estrae la griglia dall'input, iniziando dalla riga che contiene 'S'."""
+    return list(iter_grid(lines))
+
+def report_progress(rows, every=100_000):
+    """Inoltra le righe e stampa ogni `every` righe la velocità in righe/secondo."""
+    began = time.perf_counter()
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % every == 0:
+            print(f"{count} righe, {count / (time.perf_counter() - began):,.0f} righe/s")
+    elapsed = time.perf_counter() - began
+    if elapsed:
+        print(f"{count} righe in totale, {count / elapsed:,.0f} righe/s")
+
+def stream_manifold(path, progress_every=None, **sweep_options):
+    """
+    Simula il manifold leggendo il file una riga alla volta: in memoria
+    restano solo la riga corrente e il fronte, qualunque sia la dimensione
+    del file. Se progress_every è indicato, stampa la velocità in righe/s.
+    Restituisce (split del raggio, timeline totali).
+    """
+    with open(path) as input_file:
+        rows = iter_grid(input_file)
+        if progress_every:
+            rows = report_progress(rows, progress_every)
+        return sweep_manifold(rows, **sweep_options)
 
 def part_1(data_input: list[str]) -> None:
     """Risolve la parte 1: conta gli split del raggio."""
@@ -158,8 +210,8 @@ def part_2(data_input: list[str]) -> None:
     print(f"Numero totale di timeline: {result_p2}")
 
 if __name__ == "__main__":
-    # Legge l'input del giorno 7
-    data = utils.read_input_str(7, str, True)
-    # Esegue entrambe le parti
-    part_1(data)
-    part_2(data)
\ No newline at end of file
+    # Simula il manifold del giorno 7 leggendo il file in streaming:
+    # entrambe le parti escono dallo stesso passaggio
+    splits, timelines = stream_manifold(utils.input_path(7, True))
+    print(f"Il raggio viene diviso {splits} volte")
+    print(f"Numero totale di timeline: {timelines}")
\ No newline at end of file
@@ -1,11 +1,21 @@
 import heapq
 import math
 import re
+from array import array
+from bisect import bisect_left
 from dataclasses import dataclass
-from typing import Counter, Iterable
-from scipy.spatial import cKDTree
+from itertools import combinations, islice
+from typing import Iterator
+import numpy as np
+from scipy.spatial import Delaunay, QhullError, cKDTree
 import utils
 
+# Pattern per estrarre i numeri da una riga, compilato una sola volta
+NUMBER_PATTERN = re.compile(r"\d+")
+# Tabella che trasforma ogni byte non numerico in uno spazio, per il parsing in blocco
+NON_DIGITS_TO_SPACES = bytes(c if chr(c).isdigit() else ord(" ") for c in range(256))
+
+
 class JBox:
     pass
 
@@ -49,10 +59,8 @@ class JBox:
         Raises:
             AssertionError: Se la stringa non contiene esattamente 3 numeri
         """
-        # Compila un pattern regex per trovare tutti i numeri nella stringa
-        pattern = re.compile(r"\d+")
-        # Estrae tutti i numeri trovati
-        coords = re.findall(pattern, string)
+        # Estrae tutti i numeri trovati con il pattern compilato una sola volta
+        coords = NUMBER_PATTERN.findall(string)
         # Verifica che siano state trovate esattamente 3 coordinate
         assert len(coords) == 3, f"Not enough coordinates from {string=}"
         # Crea e restituisce una nuova istanza JBox convertendo le stringhe in interi
@@ -69,190 +77,338 @@ class JBox:
         return self.x, self.y, self.z
 
 
-def add_new_pair(
-        circuits: Counter[frozenset[int]],
-        connected: set[int],
-        left: int,
-        right: int,
-) -> None:
+class CircuitSet:
     """
-    Aggiunge una nuova coppia di nodi ai circuiti esistenti.
+    Insieme disgiunto (union-find) che rappresenta i circuiti formati dalle junction box.
 
-    Se uno dei due nodi è già presente in un circuito esistente, la coppia viene
-    unita a quel circuito. Altrimenti, viene creato un nuovo circuito contenente
-    solo la coppia.
+    Ogni junction box è identificata dal suo indice; i padri e le dimensioni
+    sono memorizzati in array compatti invece che in frozenset, così ogni
+    connessione costa tempo quasi costante (path compression + union by size).
 
-    Args:
-        circuits: Counter che mappa circuiti (frozenset di indici) alla loro dimensione
-        connected: Set di tutti gli indici di nodi già connessi
-        left: Indice del primo nodo della coppia
-        right: Indice del secondo nodo della coppia
-
-    Returns:
-        None: Modifica circuits e connected in-place
-    """
-    # Crea un frozenset con i due nodi da connettere
-    pair = frozenset([left, right])
-    # Aggiunge entrambi i nodi all'insieme dei nodi connessi
-    connected.update(pair)
-
-    key_to_delete = None
-    # Cerca se uno dei due nodi è già presente in un circuito esistente
-    for key in circuits.keys():
-        if left in key or right in key:
-            # Se trovato, segna il circuito per la rimozione
-            key_to_delete = key
-            # Crea un nuovo circuito che unisce quello esistente con la nuova coppia
-            new_key = frozenset({*key, *pair})
-            circuits[new_key] = len(new_key)
-    else:
-        # Se nessun nodo è presente in circuiti esistenti, crea un nuovo circuito
-        connected.update(pair)
-        circuits[pair] = 2
-
-    # Rimuove il vecchio circuito se è stato sostituito
-    if key_to_delete is not None:
-        del circuits[key_to_delete]
-
-
-def extend_one_circuit(
-        circuits: Counter[frozenset[int]],
-        present_element: int,
-        missing_element: int
-) -> None:
+    Attributes:
+        parent (array): Per ogni indice, il padre nell'albero del suo circuito
+        size (array): Per ogni radice, il numero di junction box nel circuito
+        components (int): Numero di circuiti distinti (box isolate comprese)
     """
-    Estende un circuito esistente aggiungendo un nuovo nodo.
 
-    Trova il circuito che contiene present_element e aggiunge missing_element
-    a quel circuito, sostituendo il vecchio circuito con uno nuovo più grande.
+    def __init__(self, number_of_boxes: int):
+        """
+        Crea un circuito separato per ognuna delle number_of_boxes junction box.
 
-    Args:
-        circuits: Counter che mappa circuiti (frozenset di indici) alla loro dimensione
-        present_element: Indice del nodo già presente nel circuito
-        missing_element: Indice del nodo da aggiungere al circuito
+        Args:
+            number_of_boxes (int): Numero di junction box da gestire
+        """
+        self.parent = array("q", range(number_of_boxes))
+        self.size = array("q", [1]) * number_of_boxes
+        self.components = number_of_boxes
 
-    Returns:
-        None: Modifica circuits in-place
-    """
-    key_to_delete = None
-    for keyset in circuits.keys():
-        if present_element in keyset:
-            key_to_delete = keyset
-            crowd = frozenset({*keyset, missing_element})
-            circuits[crowd] = len(crowd)
-            break
-    del circuits[key_to_delete]
-
-
-def merge_two_circuits(
-        circuits: Counter[frozenset[int]],
-        left: int,
-        right: int,
-) -> None:
+    def find(self, index: int) -> int:
+        """
+        Restituisce la radice del circuito che contiene index.
+
+        Usa il path halving: ogni nodo visitato viene agganciato al nonno,
+        appiattendo l'albero senza ricorsione.
+
+        Args:
+            index (int): Indice della junction box
+
+        Returns:
+            int: Indice della radice del circuito
+        """
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, left: int, right: int) -> bool:
+        """
+        Collega i circuiti che contengono left e right.
+
+        L'albero più piccolo viene appeso a quello più grande (union by size).
+
+        Args:
+            left (int): Indice della prima junction box
+            right (int): Indice della seconda junction box
+
+        Returns:
+            bool: True se i due circuiti erano distinti e sono stati fusi,
+                  False se le box erano già nello stesso circuito
+        """
+        left_root, right_root = self.find(left), self.find(right)
+        if left_root == right_root:
+            return False
+        if self.size[left_root] < self.size[right_root]:
+            left_root, right_root = right_root, left_root
+        self.parent[right_root] = left_root
+        self.size[left_root] += self.size[right_root]
+        self.components -= 1
+        return True
+
+    def largest(self, k: int) -> list[int]:
+        """
+        Restituisce le dimensioni dei k circuiti più grandi, in ordine decrescente.
+
+        Args:
+            k (int): Numero di circuiti da restituire
+
+        Returns:
+            list[int]: Dimensioni dei k circuiti più grandi
+        """
+        parent, size = self.parent, self.size
+        return heapq.nlargest(k, (size[i] for i in range(len(parent)) if parent[i] == i))
+
+
+def parse_jboxes(text: str | bytes) -> np.ndarray:
     """
-    Fonde due circuiti distinti in uno solo.
+    Converte in blocco il testo di input in un array (N, 3) di coordinate.
 
-    Trova i due circuiti che contengono rispettivamente left e right, e li
-    unisce in un unico circuito più grande. Se i due nodi sono già nello
-    stesso circuito, non fa nulla.
+    Tutti i caratteri non numerici diventano separatori e i numeri vengono
+    letti da NumPy in un'unica passata, senza creare oggetti per riga.
 
     Args:
-        circuits: Counter che mappa circuiti (frozenset di indici) alla loro dimensione
-        left: Indice del nodo nel primo circuito
-        right: Indice del nodo nel secondo circuito
+        text (str | bytes): Contenuto del file, una junction box per riga
 
     Returns:
-        None: Modifica circuits in-place. Ritorna None se i nodi sono già nello stesso circuito.
+        np.ndarray: Array int64 di forma (N, 3) con le coordinate x, y, z
+
+    Raises:
+        AssertionError: Se una riga non vuota non contiene esattamente 3 numeri
+
+    >>> parse_jboxes("1,2\\n3,4,5,6\\n7,8,9")
+    Traceback (most recent call last):
+    ...
+    AssertionError: Expected 3 coordinates per line, line 1 has 2
     """
-    left_key, right_key = None, None
-    for keyset in circuits.keys():
-        if left in keyset:
-            left_key = keyset
-        if right in keyset:
-            right_key = keyset
-    if left_key == right_key:
-        return None
-    new_key = frozenset({*left_key, *right_key})
-    circuits[new_key] = len(new_key)
-    del circuits[left_key]
-    del circuits[right_key]
-    return None
+    if isinstance(text, str):
+        text = text.encode()
+    # Controllo per riga, anch'esso in blocco: ogni numero inizia dove una cifra segue un
+    # non-cifra, e la sua riga è il numero di a capo che lo precedono
+    raw = np.frombuffer(text, dtype=np.uint8)
+    digits = (raw >= ord("0")) & (raw <= ord("9"))
+    starts = np.flatnonzero(digits & ~np.concatenate(([False], digits[:-1])))
+    counts = np.bincount(np.searchsorted(np.flatnonzero(raw == ord("\n")), starts))
+    wrong = np.flatnonzero((counts != 0) & (counts != 3))
+    assert len(wrong) == 0, f"Expected 3 coordinates per line, line {wrong[0] + 1} has {counts[wrong[0]]}"
+    values = np.fromstring(text.translate(NON_DIGITS_TO_SPACES), dtype=np.int64, sep=" ")
+    return values.reshape(-1, 3)
 
 
 class PlayGround:
-    def __init__(self, lines: list[str]):
+    def __init__(self, lines: list[str] | np.ndarray):
         self.neighbors = None
-        self.jboxes:list[JBox] = [JBox.from_string(line) for line in lines]
+        if isinstance(lines, np.ndarray):
+            self.coordinates = lines.astype(np.int64, copy=False).reshape(-1, 3)
+        else:
+            self.coordinates = parse_jboxes("\n".join(lines))
+
+    @staticmethod
+    def from_text(text: str | bytes) -> "PlayGround":
+        return PlayGround(parse_jboxes(text))
+
+    def __len__(self) -> int:
+        return len(self.coordinates)
+
+    def jbox(self, index: int) -> JBox:
+        """
+        Crea la JBox di indice index solo quando viene richiesta.
+
+        Args:
+            index (int): Indice della junction box
+
+        Returns:
+            JBox: Junction box con le coordinate della riga index
+        """
+        return JBox(*self.coordinates[index].tolist())
+
+    def closest_pairs(self, initial_rank: int = 16) -> Iterator[tuple[int, int]]:
+        """
+        Genera le coppie di junction box (i, j), con i < j, in ordine di distanza crescente.
+
+        Ogni box ha un cursore sui propri vicini restituiti dal KD-tree, ordinati per
+        (distanza, indice); un heap globale contiene, per ogni box, il prossimo vicino
+        non ancora consumato. Quando i vicini di una box finiscono, il KD-tree viene
+        interrogato di nuovo con k raddoppiato e si riprende dall'ultima chiave
+        (distanza, j) consumata: a parità di distanza le coppie escono in ordine di
+        indice, senza salti né duplicati. La memoria dipende quindi solo dalle coppie
+        effettivamente consumate e non da N².
+
+        Args:
+            initial_rank (int): Numero di vicini richiesti inizialmente per ogni box
 
-    def find_n_closest_pair_indices(self, number_of_pairs: int) -> Iterable[tuple[int, int]]:
-        vectors = [jbox.cords for jbox in self.jboxes]
-        max_rank = len(vectors)
+        Yields:
+            tuple[int, int]: Indici della coppia, dalla più vicina alla più lontana
+
+        Su un reticolo, dove molte distanze sono uguali, il flusso coincide con tutte
+        le coppie ordinate per (distanza, i, j); un initial_rank piccolo forza molte
+        nuove interrogazioni del KD-tree:
+
+        >>> coordinates = np.indices((4, 4, 3)).reshape(3, -1).T * 7
+        >>> expected = sorted(combinations(range(len(coordinates)), 2),
+        ...                   key=lambda pair: (math.dist(coordinates[pair[0]], coordinates[pair[1]]), *pair))
+        >>> list(PlayGround(coordinates).closest_pairs(initial_rank=2)) == expected
+        True
+        """
+        vectors = self.coordinates
+        size = len(vectors)
+        if size < 2:
+            return
         self.neighbors = cKDTree(vectors)
 
-        distances, indices = self.neighbors.query(vectors, k=max_rank+1)
-        paired_distance = {}
-        for i in range(max_rank):
-            for rank in range(1, max_rank+1):
-                j = int(indices[i, rank])
-                key = (min(i,j), max(i,j))
-                distance = distances[i, rank]
-                if key not in paired_distance:
-                    paired_distance[key] = distance
-        return heapq.nsmallest(number_of_pairs, paired_distance.keys(), key=paired_distance.get)
-
-
-    def circuit_counter(self, connections: int) -> Counter[frozenset[int]]:
-        connected: set[int] = set()
-        circuits: Counter[frozenset[int]] = Counter()
-        for i, j in self.find_n_closest_pair_indices(connections):
-            if len(connected) == 0:
-                add_new_pair(circuits, connected, i, j)
-            elif i not in connected and j not in connected:
-                add_new_pair(circuits, connected, i, j)
-            elif i in connected and j not in connected:
-                extend_one_circuit(circuits, i, j)
-                connected.add(j)
-            elif i not in connected and j in connected:
-                extend_one_circuit(circuits, j, i)
-                connected.add(i)
-            else:
-                merge_two_circuits(circuits, i, j)
+        def sorted_row(distances: np.ndarray, indices: np.ndarray) -> tuple[list[float], list[int]]:
+            # Vicini ordinati per (distanza, indice): il KD-tree non ordina le distanze
+            # uguali sempre allo stesso modo tra un'interrogazione e l'altra
+            order = np.lexsort((indices, distances))
+            return distances[order].tolist(), indices[order].tolist()
+
+        rank = min(initial_rank, size)
+        # Per ogni box: distanze e indici dei vicini già noti e l'ultima chiave (distanza, j) consumata
+        distances, indices = self.neighbors.query(vectors, k=list(range(1, rank + 1)))
+        known = [sorted_row(d, j) for d, j in zip(distances, indices)]
+        consumed: list[tuple[float, int]] = [(-1.0, -1)] * size
+        cursors = [0] * size
+        ranks = [rank] * size
+        heap: list[tuple[float, int, int]] = []
+
+        def advance(i: int) -> None:
+            # Inserisce nell'heap il prossimo vicino j > i con chiave successiva all'ultima consumata
+            while True:
+                distances, indices = known[i]
+                complete = ranks[i] == size
+                # Se la riga è troncata, tra i vicini alla distanza massima ne possono mancare
+                # alcuni a pari distanza: si consumano solo dopo aver allargato la riga
+                limit = len(distances) if complete else bisect_left(distances, distances[-1])
+                cursor = cursors[i]
+                while cursor < limit and (indices[cursor] <= i or (distances[cursor], indices[cursor]) <= consumed[i]):
+                    cursor += 1
+                cursors[i] = cursor
+                if cursor < limit:
+                    consumed[i] = (distances[cursor], indices[cursor])
+                    heapq.heappush(heap, (distances[cursor], i, indices[cursor]))
+                    return
+                if complete:
+                    return
+                # Vicini esauriti: raddoppia k e riprende dopo l'ultima chiave (distanza, j) consumata,
+                # non dalla stessa posizione, che nella nuova riga può indicare un altro vicino
+                ranks[i] = min(ranks[i] * 2, size)
+                known[i] = sorted_row(*self.neighbors.query(vectors[i], k=list(range(1, ranks[i] + 1))))
+                cursors[i] = 0
+
+        for i in range(size):
+            advance(i)
+
+        while heap:
+            _, i, j = heapq.heappop(heap)
+            yield i, j
+            advance(i)
+
+    def find_n_closest_pair_indices(self, number_of_pairs: int) -> list[tuple[int, int]]:
+        return list(islice(self.closest_pairs(), number_of_pairs))
+
+    def circuit_counter(self, connections: int) -> CircuitSet:
+        circuits = CircuitSet(len(self))
+        for i, j in islice(self.closest_pairs(), connections):
+            circuits.union(i, j)
         return circuits
 
     def last_two_junctions_xes(self):
-        estimated_connections = math.comb(len(self.jboxes), 2) // 2
-        connected: set[int] = set()
-        circuits: Counter[frozenset[int]] = Counter()
-        for i, j in self.find_n_closest_pair_indices(estimated_connections):
-            if len(connected) == 0:
-                add_new_pair(circuits, connected, i, j)
-            elif i not in connected and j not in connected:
-                add_new_pair(circuits, connected, i, j)
-            elif i in connected and j not in connected:
-                extend_one_circuit(circuits, i, j)
-                connected.add(j)
-            elif i not in connected and j in connected:
-                extend_one_circuit(circuits, j, i)
-                connected.add(i)
-            else:
-                merge_two_circuits(circuits, i, j)
-            if len(connected) == len(self.jboxes) and len(circuits.keys()) == 1:
-                return self.jboxes[i].x * self.jboxes[j].x
-        raise RuntimeError("Raise the estimated_connections")
+        circuits = CircuitSet(len(self))
+        for i, j in self.closest_pairs():
+            if circuits.union(i, j) and circuits.components == 1:
+                return self.jbox(i).x * self.jbox(j).x
+        raise ValueError("At least two junction boxes are needed")
+
+    def minimum_spanning_tree_edges(self) -> Iterator[tuple[int, int]]:
+        """
+        Genera, in ordine di lunghezza, gli archi candidati per l'albero ricoprente minimo.
+
+        L'albero ricoprente minimo euclideo è contenuto nella triangolazione di
+        Delaunay, quindi basta ordinare i suoi O(N) archi invece di tutte le
+        N² coppie. Le box con le stesse coordinate vengono prima ridotte alla
+        copia di indice minimo e unite ad essa con archi di lunghezza 0: a
+        parità di lunghezza l'ordine (distanza, i, j) resta quello di
+        closest_pairs. Le box scartate da Qhull (quasi complanari) vengono
+        collegate al vertice più vicino indicato da Qhull stesso.
+
+        Yields:
+            tuple[int, int]: Indici degli archi, dal più corto al più lungo
+
+        Raises:
+            QhullError: Se i punti sono degeneri (es. tutti complanari)
+        """
+        vectors = self.coordinates
+        size = len(vectors)
+        # Coordinate distinte e, per ognuna, la copia di indice minimo che la rappresenta
+        distinct, representatives, inverse = np.unique(vectors, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        triangulation = Delaunay(distinct)
+
+        # Le copie di una stessa box sono a distanza 0 dal loro rappresentante
+        copies = np.flatnonzero(representatives[inverse] != np.arange(size))
+        for i, j in zip(representatives[inverse[copies]].tolist(), copies.tolist()):
+            yield i, j
+
+        # Ogni tetraedro contribuisce con i suoi 6 spigoli
+        simplices = triangulation.simplices
+        edges = np.concatenate([simplices[:, [a, b]] for a, b in combinations(range(4), 2)])
+        if len(triangulation.coplanar):
+            edges = np.concatenate([edges, triangulation.coplanar[:, [0, 2]]])
+        edges = representatives[edges]
+        edges.sort(axis=1)
+        # Deduplica gli spigoli condivisi codificando ogni coppia in un solo intero
+        keys = np.unique(edges[:, 0].astype(np.int64) * size + edges[:, 1])
+        edges = np.stack((keys // size, keys % size), axis=1)
+
+        # Distanze al quadrato in interi: stesso ordine delle distanze, nessun errore di arrotondamento
+        deltas = vectors[edges[:, 0]] - vectors[edges[:, 1]]
+        lengths = np.einsum("ij,ij->i", deltas, deltas)
+        for i, j in edges[np.argsort(lengths, kind="stable")].tolist():
+            yield i, j
+
+    def last_connection_mst(self) -> int:
+        """
+        Trova l'ultima connessione che unisce tutte le box in un solo circuito.
+
+        È l'arco più lungo dell'albero ricoprente minimo, calcolato con Kruskal
+        sui soli archi di Delaunay in O(N log N). Se la triangolazione non è
+        possibile (troppi pochi punti o punti degeneri) ripiega sulla
+        enumerazione delle coppie di last_two_junctions_xes.
+
+        Returns:
+            int: Prodotto delle coordinate X delle due box dell'ultima connessione
+
+        Con box duplicate e archi di pari lunghezza il risultato coincide con
+        quello di last_two_junctions_xes:
+
+        >>> playground = PlayGround(["2,1,1", "3,2,0", "1,2,1", "3,0,2", "1,1,3", "2,1,1", "3,2,1", "1,3,3"])
+        >>> playground.last_connection_mst(), playground.last_two_junctions_xes()
+        (2, 2)
+        """
+        try:
+            edges = self.minimum_spanning_tree_edges()
+            circuits = CircuitSet(len(self))
+            for i, j in edges:
+                if circuits.union(i, j) and circuits.components == 1:
+                    return self.jbox(i).x * self.jbox(j).x
+        except (QhullError, ValueError):
+            pass
+        return self.last_two_junctions_xes()
 
 
 class Solution:
     def __init__(self):
-        self.lines = utils.read_input(8, self.map_fn_str, False)
+        self.text = utils.read_input_entire_str(8, False)
 
     def first_task(self, connections=10) -> int:
-        playground = PlayGround(self.lines)
+        playground = PlayGround.from_text(self.text)
         circuits = playground.circuit_counter(connections)
-        return math.prod(length for _, length in circuits.most_common(3))
+        return math.prod(circuits.largest(3))
 
 
-    def second_task(self) -> int:
-        playground = PlayGround(self.lines)
+    def second_task(self, mst: bool = True) -> int:
+        playground = PlayGround.from_text(self.text)
+        if mst:
+            return playground.last_connection_mst()
         return playground.last_two_junctions_xes()
 
     @staticmethod
@@ -1,3 +1,5 @@
+import numpy as np
+import shapely
 import utils
 """
 Converte una stringa nel formato "x,y" in una tupla di interi (x, y)
@@ -24,6 +26,71 @@ def largest(tiles: list[tuple[int,int]]) -> int:
             best = max(best, (abs(xy1[0] - xy2[0]) + 1) * (abs(xy1[1] - xy2[1]) + 1))
     return best
 
+"""
+Restituisce la maschera dei punti "minimi" (a scala): quelli per cui nessun altro punto
+ha x e y entrambe minori o uguali. Ordinati per x (e y a parità di x), un punto è minimo
+se la sua y è strettamente minore di tutte quelle che lo precedono.
+"""
+def staircase(points: np.ndarray) -> np.ndarray:
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    ys = points[order, 1]
+    previous_min = np.concatenate(([np.iinfo(ys.dtype).max], np.minimum.accumulate(ys)[:-1]))
+    mask = np.zeros(len(points), dtype=bool)
+    mask[order] = ys < previous_min
+    return mask
+
+"""
+Tipo con cui calcolare le aree tra i punti: int64 se l'area del riquadro che li contiene
+sta in int64, altrimenti object (interi Python), così i prodotti non traboccano in silenzio.
+"""
+def area_dtype(points: np.ndarray) -> type:
+    if not len(points):
+        return np.int64
+    low, high = points.min(axis=0).tolist(), points.max(axis=0).tolist()
+    width, height = high[0] - low[0] + 1, high[1] - low[1] + 1
+    return np.int64 if width * height < 1 << 63 else object
+
+"""
+Area massima tra un punto di first e uno di second, calcolata in blocco con NumPy
+a blocchi di righe per limitare la memoria a circa block_size aree per volta.
+"""
+def largest_between(first: np.ndarray, second: np.ndarray, block_size: int = 1 << 22) -> int:
+    best = 0
+    if not len(first) or not len(second):
+        return best
+    dtype = area_dtype(np.concatenate((first, second)))
+    first, second = first.astype(dtype), second.astype(dtype)
+    rows = max(1, block_size // len(second))
+    for start in range(0, len(first), rows):
+        block = first[start:start + rows]
+        widths = np.abs(block[:, None, 0] - second[None, :, 0]) + 1
+        heights = np.abs(block[:, None, 1] - second[None, :, 1]) + 1
+        best = max(best, int((widths * heights).max()))
+    return best
+
+"""
+Come largest, ma prima scarta i punti che non possono essere un vertice ottimo.
+In una coppia "/" (basso-sinistra, alto-destra) se un punto è dominato da un altro più in basso
+a sinistra, sostituirlo dà un rettangolo più grande: bastano le due scale opposte (minimi e
+massimi), che contengono anche le catene estreme dell'inviluppo convesso. Lo stesso vale per le
+coppie "\" con le scale alto-sinistra e basso-destra. Le aree tra i sopravvissuti si calcolano
+in blocco con NumPy.
+Restituisce (area massima, numero di punti scartati).
+"""
+def largest_pruned(tiles: list[tuple[int,int]]) -> tuple[int, int]:
+    points = np.array(tiles, dtype=np.int64).reshape(-1, 2)
+    if len(points) < 2:
+        return 0, 0
+    # Le quattro scale si ottengono cambiando il segno delle coordinate
+    lower_left = staircase(points)
+    upper_right = staircase(-points)
+    upper_left = staircase(points * [1, -1])
+    lower_right = staircase(points * [-1, 1])
+    best = max(largest_between(points[lower_left], points[upper_right]),
+               largest_between(points[upper_left], points[lower_right]))
+    survivors = lower_left | upper_right | upper_left | lower_right
+    return best, len(points) - int(np.count_nonzero(survivors))
+
 """
 Verifica se un rettangolo definito da (x1,y1,x2,y2) interseca uno dei bordi/edge forniti
 """
@@ -34,38 +101,177 @@ def intersect(edges: list[tuple[int, int, int, int]], x1:int, y1:int, x2:int, y2
     return False
 
 """
-Trova l'area massima di un rettangolo tra due punti che NON interseca nessun bordo
+Indice spaziale sui bordi del poligono (STRtree di shapely): per ogni rettangolo vengono
+esaminati solo i bordi il cui ingombro tocca quello del rettangolo, poi filtrati con la
+stessa condizione stretta di intersect.
+"""
+class EdgeIndex:
+    def __init__(self, edges: list[tuple[int, int, int, int]]):
+        self.edges = np.array(edges, dtype=np.int64).reshape(-1, 4)
+        segments = self.edges.reshape(-1, 2, 2)
+        self.tree = shapely.STRtree(shapely.linestrings(segments))
+
+    """
+    Indici dei bordi che attraversano davvero i rettangoli: rects ha forma (M, 4).
+    Restituisce (indice del rettangolo, indice del bordo) per ogni intersezione.
+    """
+    def _hits(self, rects: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        rect_ids, edge_ids = self.tree.query(shapely.box(rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]))
+        r, e = rects[rect_ids], self.edges[edge_ids]
+        crossing = (r[:, 0] < e[:, 2]) & (r[:, 2] > e[:, 0]) & (r[:, 1] < e[:, 3]) & (r[:, 3] > e[:, 1])
+        return rect_ids[crossing], edge_ids[crossing]
+
+    """
+    Restituisce l'indice del primo bordo che interseca il rettangolo, oppure None
+    """
+    def first_hit(self, x1: int, y1: int, x2: int, y2: int) -> int | None:
+        for edge_id in self.tree.query(shapely.box(x1, y1, x2, y2)):
+            edge = self.edges[edge_id]
+            if x1 < edge[2] and x2 > edge[0] and y1 < edge[3] and y2 > edge[1]:
+                return int(edge_id)
+        return None
+
+    def intersects(self, x1: int, y1: int, x2: int, y2: int) -> bool:
+        return self.first_hit(x1, y1, x2, y2) is not None
+
+    """
+    Verifica in una sola chiamata molti rettangoli (M, 4): True dove almeno un bordo li interseca
+    """
+    def intersects_many(self, rects: np.ndarray) -> np.ndarray:
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        result = np.zeros(len(rects), dtype=bool)
+        result[self._hits(rects)[0]] = True
+        return result
+
+"""
+Trova l'area massima di un rettangolo tra due punti che NON interseca nessun bordo.
+I bordi vengono interrogati tramite EdgeIndex: per ogni punto i rettangoli verso i punti
+successivi che potrebbero migliorare il risultato sono verificati in un'unica chiamata.
 """
 def largest_inside(edges: list[tuple[int, int, int, int]], tiles: list[tuple[int,int]]) -> int:
+    index = EdgeIndex(edges)
+    points = np.array(tiles, dtype=np.int64).reshape(-1, 2)
+    dtype = area_dtype(points)
     best = 0
-    for n, xy1 in enumerate(tiles[:-1]):
-        for xy2 in tiles[n + 1:]:
-            x1, x2 = (xy1[0], xy2[0]) if xy1[0] < xy2[0] else (xy2[0], xy1[0])
-            y1, y2 = (xy1[1], xy2[1]) if xy1[1] < xy2[1] else (xy2[1], xy1[1])
-            area = (x2 - x1 + 1) * (y2 - y1 + 1)
-            if area > best and not intersect(edges, x1, y1, x2, y2):
-                best = area
+    for n in range(len(points) - 1):
+        others = points[n + 1:]
+        x1, x2 = np.minimum(others[:, 0], points[n, 0]), np.maximum(others[:, 0], points[n, 0])
+        y1, y2 = np.minimum(others[:, 1], points[n, 1]), np.maximum(others[:, 1], points[n, 1])
+        areas = (x2 - x1 + 1).astype(dtype) * (y2 - y1 + 1).astype(dtype)
+        candidates = areas > best
+        if not candidates.any():
+            continue
+        rects = np.stack((x1, y1, x2, y2), axis=1)[candidates]
+        free = ~index.intersects_many(rects)
+        if free.any():
+            best = int(areas[candidates][free].max())
+    return best
+
+"""
+Crea i bordi del poligono come rettangoli degeneri (x_min, y_min, x_max, y_max)
+"""
+def polygon_edges(tiles: list[tuple[int,int]]) -> list[tuple[int, int, int, int]]:
+    return [(min(xy1[0], xy2[0]), min(xy1[1], xy2[1]), max(xy1[0], xy2[0]), max(xy1[1], xy2[1]))
+            for xy1, xy2 in pairs(tiles, len(tiles))]
+
+"""
+Rasterizza l'interno del poligono (rettilineo) sulla griglia compressa.
+xs e ys sono le coordinate distinte ordinate; la cella (i, j) è il rettangolo aperto
+(xs[i], xs[i+1]) × (ys[j], ys[j+1]), che è tutto dentro o tutto fuori dal poligono.
+Ogni lato verticale inverte la parità delle celle alla sua destra: si segna
+l'inversione con una differenza lungo y e si accumula con XOR lungo y e poi lungo x.
+"""
+def rasterize_inside(tiles: list[tuple[int,int]], xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    toggles = np.zeros((len(xs), len(ys)), dtype=np.uint8)
+    for (ax, ay), (bx, by) in pairs(tiles, len(tiles)):
+        assert ax == bx or ay == by, f"Il lato {(ax, ay)}-{(bx, by)} non è orizzontale né verticale"
+        if ax == bx and ay != by:
+            column = np.searchsorted(xs, ax)
+            low, high = np.searchsorted(ys, (min(ay, by), max(ay, by)))
+            toggles[column, low] ^= 1
+            toggles[column, high] ^= 1
+    crossings = np.bitwise_xor.accumulate(toggles, axis=1)[:, :-1]
+    return np.bitwise_xor.accumulate(crossings, axis=0)[:-1].astype(bool)
+
+"""
+Tabella delle somme prefisse 2D: prefix[i, j] = somma di values[:i, :j].
+La somma su un blocco qualsiasi di celle si ottiene con 4 letture.
+"""
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    prefix = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.int32)
+    np.cumsum(values, axis=0, dtype=np.int32, out=prefix[1:, 1:])
+    np.cumsum(prefix[1:, 1:], axis=1, out=prefix[1:, 1:])
+    return prefix
+
+"""
+Come largest_inside, ma con la griglia compressa: il poligono viene rasterizzato una sola volta
+e la tabella delle somme prefisse delle celle esterne rende O(1) la verifica di ogni rettangolo.
+Un rettangolo tra due vertici è valido se nessuna cella compresa tra i suoi lati è esterna;
+se è degenere (larghezza o altezza 1) basta che ogni tratto del segmento tocchi una cella interna.
+I vertici vengono esaminati in ordine decrescente di un limite superiore dell'area
+(distanza dagli estremi del poligono) e la ricerca si ferma quando il limite non può
+più battere il migliore trovato; per ogni vertice le aree verso tutti gli altri
+sono calcolate e verificate in blocco con NumPy.
+"""
+def largest_inside_compressed(tiles: list[tuple[int,int]]) -> int:
+    points = np.array(tiles, dtype=np.int64).reshape(-1, 2)
+    if len(points) < 2:
+        return 1 if len(points) else 0
+    xs, ys = np.unique(points[:, 0]), np.unique(points[:, 1])
+    inside = rasterize_inside(tiles, xs, ys)
+    outside = prefix_sums(~inside)
+
+    # Per i rettangoli degeneri: un tratto di segmento è coperto se tocca una cella interna
+    padded = np.pad(inside, 1)
+    vertical_covered = padded[:-1, 1:-1] | padded[1:, 1:-1]    # (len(xs), len(ys) - 1)
+    horizontal_covered = padded[1:-1, :-1] | padded[1:-1, 1:]  # (len(xs) - 1, len(ys))
+    vertical_gaps = np.concatenate((np.zeros((len(xs), 1), np.int32), (~vertical_covered).cumsum(axis=1, dtype=np.int32)), axis=1)
+    horizontal_gaps = np.concatenate((np.zeros((1, len(ys)), np.int32), (~horizontal_covered).cumsum(axis=0, dtype=np.int32)), axis=0)
+
+    ix = np.searchsorted(xs, points[:, 0])
+    iy = np.searchsorted(ys, points[:, 1])
+    # Aree in int64 solo se il riquadro dei punti ci sta, altrimenti in interi Python
+    coordinates = points.astype(area_dtype(points))
+    px, py = coordinates[:, 0], coordinates[:, 1]
+    x_low, x_high, y_low, y_high = int(xs[0]), int(xs[-1]), int(ys[0]), int(ys[-1])
+    bounds = ((np.maximum(px - x_low, x_high - px) + 1) * (np.maximum(py - y_low, y_high - py) + 1))
+
+    best = 0
+    for n in np.argsort(-bounds, kind="stable"):
+        if bounds[n] <= best:
+            break
+        areas = (np.abs(px - px[n]) + 1) * (np.abs(py - py[n]) + 1)
+        candidates = np.flatnonzero(areas > best)
+        if not len(candidates):
+            continue
+        x1, x2 = np.minimum(ix[candidates], ix[n]), np.maximum(ix[candidates], ix[n])
+        y1, y2 = np.minimum(iy[candidates], iy[n]), np.maximum(iy[candidates], iy[n])
+        # Celle esterne nel blocco [x1, x2) × [y1, y2)
+        blocked = outside[x2, y2] - outside[x1, y2] - outside[x2, y1] + outside[x1, y1]
+        # Segmenti verticali (x1 == x2) e orizzontali (y1 == y2)
+        vertical = x1 == x2
+        blocked[vertical] = vertical_gaps[x1[vertical], y2[vertical]] - vertical_gaps[x1[vertical], y1[vertical]]
+        horizontal = y1 == y2
+        blocked[horizontal] = horizontal_gaps[x2[horizontal], y1[horizontal]] - horizontal_gaps[x1[horizontal], y1[horizontal]]
+        valid = areas[candidates][blocked == 0]
+        if len(valid):
+            best = max(best, int(valid.max()))
     return best
 
 """
 Parte 1: trova l'area massima tra due punti qualsiasi
 """
 def part_1(tiles: list[tuple[int,int]]) -> None:
-    result = largest(tiles)
+    result, pruned = largest_pruned(tiles)
     print(f"Result part 1", result)
+    print(f"Pruned tiles {pruned}/{len(tiles)}")
 
 """
-Parte 2: crea i bordi del poligono, quindi trova l'area massima che non li interseca
+Parte 2: trova l'area massima di un rettangolo tra due punti tutto dentro al poligono
 """
 def part_2(tiles: list[tuple[int,int]]) -> None:
-    size = len(tiles)
-    edges: list[tuple[int, int, int, int]] = [((xy1[0] if xy1[0] < xy2[0] else xy2[0]),
-                                               (xy1[1] if xy1[1] < xy2[1] else xy2[1]),
-                                               (xy2[0] if xy1[0] < xy2[0] else xy1[0]),
-                                               (xy2[1] if xy1[1] < xy2[1] else xy1[1]))
-                                              for xy1, xy2 in pairs(tiles, size)]
-
-    result = largest_inside(edges, tiles)
+    result = largest_inside_compressed(tiles)
     print(f"Result part 2", result)
 
 if __name__ == "__main__":
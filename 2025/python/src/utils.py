@@ -7,16 +7,23 @@ from typing import List, Callable
 Coordinate = namedtuple("Coordinate", ["x", "y"])
 
 
+def input_path(day: int, example: bool = False) -> str:
+    """
+    Restituisce il percorso del file di input del giorno `day`,
+    o del file di esempio se `example` è True.
+    """
+    if example:
+        filename = f"{day}/day_{day}_example.txt"
+    else:
+        filename = f"{day}/day_{day}.txt"
+    return os.path.join("../../", "inputs", filename)
+
+
 def read_input[T](
     day: int, map_fn: Callable[[str], T] = str, example: bool = False
 ) -> List[T]:
     try:
-        if example:
-            filename = f"{day}/day_{day}_example.txt"
-        else:
-            filename = f"{day}/day_{day}.txt"
-
-        with open(os.path.join("../../", "inputs", filename)) as input_file:
+        with open(input_path(day, example)) as input_file:
             # da capire meglio lo strip
             return [map_fn(line.strip()) for line in input_file]
     except FileNotFoundError as e:
@@ -27,12 +34,7 @@ def read_input_str[T](
     day: int, map_fn: Callable[[str], T] = str, example: bool = False
 ) -> List[T]:
     try:
-        if example:
-            filename = f"{day}/day_{day}_example.txt"
-        else:
-            filename = f"{day}/day_{day}.txt"
-
-        with open(os.path.join("../../", "inputs", filename)) as input_file:
+        with open(input_path(day, example)) as input_file:
             return input_file.readlines()
     except FileNotFoundError as e:
         print(e)
@@ -42,12 +44,7 @@ def read_input_entire_str(
     day: int, example: bool = False
 ) -> str:
     try:
-        if example:
-            filename = f"{day}/day_{day}_example.txt"
-        else:
-            filename = f"{day}/day_{day}.txt"
-
-        with open(os.path.join("../../", "inputs", filename)) as input_file:
+        with open(input_path(day, example)) as input_file:
             return input_file.read()
     except FileNotFoundError as e:
         print(e)
@@ -71,11 +68,7 @@ def read_multisection_input[T](
     """
 
     try:
-        if example:
-            filename = f"{day}/day_{day}_example.txt"
-        else:
-            filename = f"{day}/day_{day}.txt"
-        with open(os.path.join("../../", "inputs", filename)) as input_file:
+        with open(input_path(day, example)) as input_file:
             sections = input_file.read().split("\n\n")
             return [
                 transformer(section)